@@ -5,7 +5,7 @@
 # GitHub   : https://github.com/SongshGeo
 # Website: https://cv.songshgeo.com/
 
-from .env import CompetingCell, Env
+from .env import CompetingCell, CompetingModule, Env
 from .farmer import Farmer
 from .hunter import Hunter
 from .people import SiteGroup
@@ -15,6 +15,7 @@ __all__ = [
     "Farmer",
     "Hunter",
     "CompetingCell",
+    "CompetingModule",
     "Env",
     "RiceFarmer",
     "SiteGroup",
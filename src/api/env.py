@@ -9,61 +9,144 @@
 
 from __future__ import annotations
 
-from typing import Optional
+from typing import Dict, List, Optional, Sequence
 
 import numpy as np
-import rasterio
-from abses import ActorsList, BaseNature, PatchCell, raster_attribute
+from abses import ActorsList, BaseNature, PatchCell, PatchModule, raster_attribute
+from abses.agents.container import _CellAgentsContainer
 
 from src.api.farmer import Farmer
 from src.api.hunter import Hunter
+from src.api.landscape import (
+    SUITABILITY_LAYERS,
+    NeighbourhoodIndex,
+    near_water,
+    pick_in_groups,
+    suitability_layers,
+)
+from src.api.params import ParamsCache
 from src.api.people import SiteGroup
+from src.api.preprocess import TERRAIN_DTYPES, TERRAIN_LAYERS, landscape_bundle
 from src.api.rice_farmer import RiceFarmer
 
+# 人口图层的名称，以及计入该图层的主体类型（水稻农民也是农民）
+POPULATION_LAYERS = {"farmers": Farmer, "hunters": Hunter, "rice_farmers": RiceFarmer}
+
+
+# 保存在图层数组里的地形属性的默认值，数据类型见 `TERRAIN_DTYPES`
+TERRAIN_DEFAULTS = {"elevation": np.nan, "slope": np.nan, "lim_h": 0.0}
+
+
+class _OccupiedCellAgents(_CellAgentsContainer):
+    """斑块上的主体容器，主体进出时同步更新图层的占据数组和人口图层"""
+
+    def _add_one(self, agent: SiteGroup) -> None:
+        super()._add_one(agent)
+        self._cell.layer.record(self._cell, agent)
+
+    def remove(self, agent: Optional[SiteGroup] = None) -> None:
+        super().remove(agent)
+        self._cell.layer.record(self._cell)
+
+    def replace(self, agent: SiteGroup, other: SiteGroup) -> None:
+        """让还不在地上的另一个主体直接取代这里的主体，图层只更新一次"""
+        self._agents.remove(agent)
+        del agent.at
+        self._agents.add(other)
+        other.at = self._cell
+        self._cell.layer.record(self._cell, other)
+
+    def hand_over(self, agent: SiteGroup, other: _OccupiedCellAgents) -> None:
+        """把主体直接交给另一个斑块，不更新图层（由图层整体更新）"""
+        self._agents.remove(agent)
+        other._agents.add(agent)
+        agent.at = other._cell
+
 
 class CompetingCell(PatchCell):
     """狩猎采集者和农民竞争的舞台"""
 
     max_agents = 1  # 一个斑块上最多有多少个主体
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.lim_h: float = 0.0
-        self.slope: float = np.random.uniform(0, 30)
-        self.elevation: float = np.random.uniform(0, 300)
-        self._is_water: Optional[bool] = None
+    def _set_layer(self, layer: CompetingModule) -> None:
+        if not isinstance(layer, CompetingModule):
+            raise TypeError(f"CompetingCell needs a CompetingModule, got {layer}.")
+        super()._set_layer(layer)
+        self._agents = _OccupiedCellAgents(
+            layer.model, cell=self, max_len=self.max_agents
+        )
+
+    def _suitability(self, name: str) -> np.generic:
+        """从图层缓存的适宜性图层中读取此处的值"""
+        return self.layer.suitability[name][self.indices]
 
-    def _count(self, breed: str) -> int:
-        """统计此处的农民或者狩猎采集者的数量"""
-        return self.agents.select(agent_type=breed).array("size").sum()
+    @property
+    def slope(self) -> float:
+        """坡度（度）"""
+        return self.layer.terrain["slope"][self.indices]
+
+    @slope.setter
+    def slope(self, value: float) -> None:
+        self.layer.set_terrain(self, "slope", value)
+
+    @property
+    def elevation(self) -> float:
+        """海拔高度（米）"""
+        return self.layer.terrain["elevation"][self.indices]
+
+    @elevation.setter
+    def elevation(self, value: float) -> None:
+        self.layer.set_terrain(self, "elevation", value)
+
+    @property
+    def lim_h(self) -> float:
+        """狩猎采集者的人口上限"""
+        return self.layer.terrain["lim_h"][self.indices]
+
+    @lim_h.setter
+    def lim_h(self, value: float) -> None:
+        self.layer.set_terrain(self, "lim_h", value)
+
+    def _population(self, name: str) -> float:
+        """从图层的人口图层中读取此处的人口规模"""
+        return self.layer.population[name][self.indices]
 
     @raster_attribute
-    def farmers(self) -> int:
-        """这里的农民有多少（size）"""
-        return self._count(Farmer)
+    def farmers(self) -> float:
+        """这里的农民有多少（size），水稻农民也算作农民"""
+        return self._population("farmers")
 
     @raster_attribute
-    def hunters(self) -> int:
-        """这里的农民有多少（size）"""
-        return self._count(Hunter)
+    def hunters(self) -> float:
+        """这里的狩猎采集者有多少（size）"""
+        return self._population("hunters")
 
     @raster_attribute
-    def rice_farmers(self) -> int:
-        """这里的农民有多少（size）"""
-        return self._count(RiceFarmer)
+    def rice_farmers(self) -> float:
+        """这里的水稻农民有多少（size）"""
+        return self._population("rice_farmers")
 
     @raster_attribute
     def is_water(self) -> bool:
-        """是否是水体"""
-        if self._is_water is None:
-            return self.elevation <= 0 or np.isnan(self.elevation)
-        return bool(self._is_water)
+        """是否是水体。没有专门设置过时，海拔不高于0或者为空值的斑块是水体。"""
+        water = self.layer.water[self.indices]
+        if water < 0:
+            elevation = self.elevation
+            return bool(elevation <= 0 or np.isnan(elevation))
+        return bool(water)
 
     @is_water.setter
     def is_water(self, value: bool) -> None:
         if not isinstance(value, (bool, np.bool_)):
             raise TypeError(f"Can only be bool type, got {type(value)}.")
-        self._is_water = bool(value)
+        if self.layer.water[self.indices] != value:
+            self.layer.water[self.indices] = value
+            self.layer.invalidate_suitability()
+
+    @raster_attribute
+    def near_water(self) -> bool:
+        """是否临近水体，即周围8个格子（不含自身）里有水体"""
+        return bool(self._suitability("near_water"))
 
     @raster_attribute
     def is_arable(self) -> bool:
@@ -79,44 +162,28 @@ class CompetingCell(PatchCell):
         returns:
             是否是耕地，是则返回 True，否则返回 False。
         """
-        # 坡度小于10度
-        cond1 = self.slope <= 10
-        # 海拔高度小于200m
-        cond2 = (self.elevation < 200) and (self.elevation > 0)
-        # 不是水体
-        cond3 = not self.is_water
-        # 条件都满足才是可耕地
-        return cond1 and cond2 and cond3
+        return bool(self._suitability("is_arable"))
 
     @raster_attribute
     def dem_suitable(self) -> int:
-        """海拔高度的适宜程度"""
-        # 0-100: 2
-        # 100-200: 1
-        # 200+: 0
-        dem = self.elevation
-        if dem < 100:
-            return 2
-        return 1 if dem < 200 else 0
+        """海拔高度的适宜程度：
+        - 0-100: 2
+        - 100-200: 1
+        - 200+: 0
+        """
+        return int(self._suitability("dem_suitable"))
 
     @raster_attribute
     def slope_suitable(self) -> int:
-        """坡度的适宜程度"""
-        # 0-2: 5
-        # 2-4: 4
-        # 4-6: 3
-        # 6-8: 2
-        # 8-10: 1
-        # 10+: 0
-        if self.slope < 2:
-            return 5
-        if self.slope < 4:
-            return 4
-        if self.slope < 6:
-            return 3
-        if self.slope < 8:
-            return 2
-        return 1 if self.slope < 10 else 0
+        """坡度的适宜程度：
+        - 0-2: 5
+        - 2-4: 4
+        - 4-6: 3
+        - 6-8: 2
+        - 8-10: 1
+        - 10+: 0
+        """
+        return int(self._suitability("slope_suitable"))
 
     @raster_attribute
     def is_rice_arable(self) -> bool:
@@ -128,19 +195,12 @@ class CompetingCell(PatchCell):
         returns:
             是否是水稻可耕地，是则返回 True，否则返回 False。
         """
-        # 坡度小于等于0.5度
-        cond1 = self.slope <= 0.5
-        # 海拔高度小于200m且大于0
-        cond2 = (self.elevation < 200) and (self.elevation > 0)
-        # 不是水体
-        cond3 = not self.is_water
-        # 条件都满足才是水稻可耕地
-        return cond1 and cond2 and cond3
+        return bool(self._suitability("is_rice_arable"))
 
     @raster_attribute
     def is_only_arable(self) -> bool:
         """是否只是普通可耕地而不是水稻可耕地"""
-        return self.is_arable and not self.is_rice_arable
+        return bool(self._suitability("is_only_arable"))
 
     def able_to_live(self, agent: SiteGroup) -> None:
         """检查该主体能否能到特定的地方:
@@ -155,11 +215,10 @@ class CompetingCell(PatchCell):
             如果被检查的主体能够在此处存活，返回True；否则返回False。
         """
         # 首先检查是否已有其他主体（所有类型都不能重叠）
-        if self.agents.has() > 0:
-            # 唯一的例外：同一个主体检查自己的位置
-            existing = self.agents.select().item("item")
-            if existing is not None and existing is not agent:
-                return False
+        # 唯一的例外：同一个主体检查自己的位置
+        occupant = self.layer.occupancy[self.indices]
+        if occupant >= 0 and occupant != agent.unique_id:
+            return False
 
         # 然后检查特定类型的要求
         if agent.breed == "Hunter":
@@ -213,7 +272,7 @@ class CompetingCell(PatchCell):
         """
         # 检查全局转化开关
         try:
-            convert_config = self.layer.model.params.get("convert", {})
+            convert_config = ParamsCache.of(self.layer.model)["convert"]
             if not convert_config.get("enabled", True):
                 return agent
 
@@ -230,15 +289,381 @@ class CompetingCell(PatchCell):
             raise TypeError(f"Agent must be inherited from SiteGroup, not {agent}.")
         if to is None:
             raise TypeError("Agent must be inherited from SiteGroup.")
-        # 创建一个新的主体
-        # print(f"Going to create size {agent.size} {convert_to}")
-        converted = self.layer.model.agents.new(to, size=agent.size, singleton=True)
+        # 创建一个新的主体（可能重新使用死亡主体留下的对象）
+        converted = to.spawn(self.layer.model, size=agent.size)
         converted.source = agent.source  # 记录原来是什么主体
-        agent.die()  # 旧的主体死亡
-        converted.move.to(self)
+        if agent.at is self and converted.alive:
+            # 新的主体直接取代旧的主体，之后旧的主体不在地上，死亡时不必再离开斑块
+            self.agents.replace(agent, converted)
+            agent.die()
+        else:
+            agent.die()  # 旧的主体死亡
+            converted.move.to(self)
         return converted
 
 
+class CompetingModule(PatchModule):
+    """由竞争斑块组成的图层。
+
+    可耕地、水稻可耕地等适宜性图层只由高程、坡度和水体决定，
+    因此在图层上整体计算一次并缓存起来，
+    只有当斑块的 `is_water`、`elevation` 或 `slope` 真正改变时才重新计算。
+
+    每个斑块最多只有一个主体，`occupancy` 数组记录了每个斑块上主体的
+    `unique_id`，空的斑块为 -1；`population` 按农民、狩猎采集者、水稻农民
+    分别记录每个斑块上的人口规模。主体移动、死亡、转化或者人口规模改变时都会同步更新。
+
+    网格本身不会改变，`neighbourhood` 是预先计算的邻域索引，
+    寻找邻居时直接使用展平后的斑块索引，而不必每次都构造斑块列表。
+
+    斑块的地形属性也保存在图层上连续的数组里，斑块只是通过自己的位置读写：
+    `terrain` 里是 float32 的高程、坡度和人口上限（没有数据时为空值），
+    `water` 记录斑块是否被专门设置成水体（1是、0否、-1按海拔判断）。
+
+    设置 `lazy_cells=True` 时，斑块对象只在第一次被用到（例如有主体进入）
+    时才创建。海洋和没有数据的像元只存在于上面这些数组里，
+    大片水域的研究区因此能省下大部分斑块对象的内存和创建时间。
+    需要完整 `array_cells` 的操作仍然可用，只是会一次性创建所有斑块。
+    """
+
+    def __init__(self, *args, lazy_cells: bool = False, **kwargs):
+        self.lazy_cells = lazy_cells
+        self._flat_cells: Optional[np.ndarray] = None
+        self._created: Optional[np.ndarray] = None
+        self._cell_cls: Optional[type] = None
+        self._suitability: Optional[Dict[str, np.ndarray]] = None
+        self.occupancy: Optional[np.ndarray] = None
+        self.population: Dict[str, np.ndarray] = {}
+        self.presence: Dict[str, np.ndarray] = {}
+        self.neighbourhood: Optional[NeighbourhoodIndex] = None
+        self.terrain: Dict[str, np.ndarray] = {}
+        self.water: Optional[np.ndarray] = None
+        super().__init__(*args, **kwargs)
+
+    def set_terrain(self, cell: CompetingCell, attr: str, value: float) -> None:
+        """设置某个斑块的地形属性，高程和坡度真正改变时让适宜性图层失效"""
+        arr = self.terrain[attr]
+        old = arr[cell.indices]
+        arr[cell.indices] = value
+        if attr != "lim_h" and arr[cell.indices] != old:
+            self.invalidate_suitability()
+
+    @property
+    def suitability(self) -> Dict[str, np.ndarray]:
+        """缓存的适宜性图层，形状与图层一致"""
+        if self._suitability is None:
+            elevation = self.terrain["elevation"]
+            is_water = np.where(
+                self.water < 0,
+                (elevation <= 0) | np.isnan(elevation),
+                self.water == 1,
+            )
+            self._suitability = suitability_layers(
+                elevation=elevation,
+                slope=self.terrain["slope"],
+                is_water=is_water,
+            )
+            self._suitability["is_water"] = is_water
+            self._suitability["near_water"] = near_water(is_water)
+        return self._suitability
+
+    def invalidate_suitability(self) -> None:
+        """地形改变后，下次读取时重新计算适宜性图层"""
+        self._suitability = None
+
+    def load_terrain(self, layers: Dict[str, np.ndarray]) -> None:
+        """载入预处理好的地形图层。
+
+        Args:
+            layers: 由 `landscape_bundle` 得到的图层，包括高程、坡度、
+                人口上限、掩膜，以及预先算好的适宜性图层。
+        """
+        self.mask = np.asarray(layers["mask"])
+        for attr in TERRAIN_DTYPES:
+            # 缓存包里的数组已经是需要的类型，不会复制，而是直接使用内存映射
+            self.terrain[attr] = np.asarray(layers[attr], dtype=TERRAIN_DTYPES[attr])
+            self._attributes.add(attr)
+        # 地形已经和缓存里的一致，不必再重新计算适宜性图层
+        self._suitability = {
+            name: arr for name, arr in layers.items() if name not in TERRAIN_LAYERS
+        }
+
+    def _initialize_cells(self, *args, **kwargs) -> None:
+        # 斑块创建的同时准备好占据数组
+        shape = (self.height, self.width)
+        self.occupancy = np.full(shape, -1, dtype=int)
+        self.population = {name: np.zeros(shape) for name in POPULATION_LAYERS}
+        self.presence = {
+            name: np.zeros(shape, dtype=bool) for name in POPULATION_LAYERS
+        }
+        self.neighbourhood = NeighbourhoodIndex(shape)
+        self.terrain = {
+            attr: np.full(shape, TERRAIN_DEFAULTS[attr], dtype=dtype)
+            for attr, dtype in TERRAIN_DTYPES.items()
+        }
+        self.water = np.full(shape, -1, dtype=np.int8)
+        self._flat_cells = np.empty(self.height * self.width, dtype=object)
+        self._created = np.zeros(self.height * self.width, dtype=bool)
+        if self.lazy_cells:
+            model, self._cell_cls = args
+            if model is not self.model:
+                raise ValueError("Model mismatching.")
+            self._cells = None
+            return
+        super()._initialize_cells(*args, **kwargs)
+        self._flat_cells[:] = np.flipud(np.array(self._cells, dtype=object).T).ravel()
+        self._created[:] = True
+
+    def cells_at(self, indices: np.ndarray) -> np.ndarray:
+        """按展平后的索引取出斑块，还没有创建的斑块在这时创建"""
+        indices = np.asarray(indices, dtype=int)
+        for index in indices[~self._created[indices]]:
+            row, col = divmod(int(index), self.width)
+            self._flat_cells[index] = self._cell_cls(
+                self, pos=(col, self.height - row - 1), indices=(row, col)
+            )
+            self._created[index] = True
+        return self._flat_cells[indices]
+
+    def release(self) -> None:
+        """运行结束后，放下对斑块对象的引用。
+
+        `_flat_cells` 是对象数组，不参与循环垃圾回收，
+        斑块、图层和模型之间的引用环需要在这里断开，模型才能被释放。
+        之后仍可以读取图层的数组，但不能再取出斑块。
+        """
+        self._flat_cells.fill(None)
+
+    def cell_at(self, index: int) -> CompetingCell:
+        """按展平后的索引取出一个斑块"""
+        return self.cells_at([index])[0]
+
+    @property
+    def array_cells(self) -> np.ndarray:
+        """所有的斑块，还没有创建的斑块会在这时全部创建"""
+        if not self._created.all():
+            self.cells_at(np.flatnonzero(~self._created))
+        return self._flat_cells.reshape(self.shape2d)
+
+    @property
+    def cells(self) -> List[List[CompetingCell]]:
+        """按列存放的斑块，与 `mesa-geo` 的 `RasterLayer.cells` 一致"""
+        if self._cells is None:
+            self._cells = np.flipud(self.array_cells).T.tolist()
+        return self._cells
+
+    def record(self, cell: CompetingCell, agent: Optional[SiteGroup] = None) -> None:
+        """记录某个斑块上的主体及其人口规模，没有主体时清空该斑块。"""
+        index = cell.indices
+        self.occupancy[index] = -1 if agent is None else agent.unique_id
+        for name, breed in POPULATION_LAYERS.items():
+            is_breed = isinstance(agent, breed)
+            self.population[name][index] = agent.size if is_breed else 0.0
+            self.presence[name][index] = is_breed
+
+    def flat_index(self, cell: CompetingCell) -> int:
+        """斑块按行优先展平后的索引"""
+        row, col = cell.indices
+        return row * self.width + col
+
+    def neighbours(
+        self,
+        cell: CompetingCell,
+        radius: int = 1,
+        moore: bool = False,
+        annular: bool = False,
+    ) -> np.ndarray:
+        """斑块周围的邻居（展平后的索引），不包括斑块本身。
+
+        与 `PatchCell.neighboring` 的含义一致，但直接查预先计算的邻域索引。
+        """
+        return self.neighbourhood.neighbours(
+            self.flat_index(cell), radius=radius, moore=moore, annular=annular
+        )
+
+    def habitat(self, breed: str) -> np.ndarray:
+        """某类主体能够生存的斑块，不考虑是否已经被占据，
+        判断规则与 `CompetingCell.able_to_live` 一致。"""
+        if breed == "Hunter":
+            return ~self.suitability["is_water"]
+        if breed == "RiceFarmer":
+            return self.suitability["is_rice_arable"]
+        if breed == "Farmer":
+            return self.suitability["is_arable"]
+        if breed == "SiteGroup":
+            return np.ones(self.shape2d, dtype=bool)
+        raise TypeError("Agent must be a valid People.")
+
+    def suitable_levels(self, breed: str) -> np.ndarray:
+        """每个斑块适宜某类主体停留的水平，与 `CompetingCell.suitable_level` 一致。"""
+        if breed in ("Hunter", "SiteGroup"):
+            return np.ones(self.shape2d)
+        if breed == "RiceFarmer":
+            return self.suitability["dem_suitable"].astype(float)
+        if breed == "Farmer":
+            layers = self.suitability
+            return layers["dem_suitable"] * 0.5 + layers["slope_suitable"] * 0.2
+        raise TypeError("Agent must be Farmer or Hunter.")
+
+    def search_cells(
+        self, origins: np.ndarray, breed: str, max_distance: int, radius: int = 1
+    ) -> np.ndarray:
+        """为一组主体同时寻找可以去的斑块，规则与 `search_cell` 一致。
+
+        从 `radius` 开始一圈一圈向外找，每圈里按适宜度加权随机选择。
+        几个主体选中同一个斑块时，按随机的优先级决定谁得到它，
+        其余的主体在同一圈里重新选择，这一圈没有空位了再向外找。
+
+        Args:
+            origins: 每个主体出发的斑块（展平后的索引）。
+            breed: 主体类型的名称。
+            max_distance: 最远移动距离。
+            radius: 从哪一圈开始找。
+
+        Returns:
+            每个主体找到的斑块（展平后的索引），没有找到的为 -1。
+        """
+        rng = self.model.rng
+        origins = np.asarray(origins, dtype=int)
+        livable = (self.occupancy.ravel() < 0) & self.habitat(breed).ravel()
+        levels = self.suitable_levels(breed).ravel()
+        targets = np.full(len(origins), -1)
+        pending = np.arange(len(origins))
+        for r in range(radius, max(radius, max_distance) + 1):
+            searching, pending = pending, pending[:0]
+            while searching.size:
+                owner, cells = self.neighbourhood.gather(origins[searching], radius=r)
+                keep = livable[cells]
+                owner, cells = owner[keep], cells[keep]
+                groups, chosen = pick_in_groups(owner, levels[cells], rng)
+                # 这一圈已经没有空位的，下一圈再找
+                found = np.zeros(searching.size, dtype=bool)
+                found[groups] = True
+                pending = np.concatenate([pending, searching[~found]])
+                if not groups.size:
+                    break
+                # 选中同一个斑块的，随机优先级最高的得到它
+                picks = cells[chosen]
+                order = np.lexsort((-rng.random(groups.size), picks))
+                first = np.ones(order.size, dtype=bool)
+                first[1:] = picks[order][1:] != picks[order][:-1]
+                winners = order[first]
+                targets[searching[groups[winners]]] = picks[winners]
+                livable[picks[winners]] = False
+                losers = np.ones(groups.size, dtype=bool)
+                losers[winners] = False
+                searching = searching[groups[losers]]
+        return targets
+
+    def relocate(self, agents: Sequence[SiteGroup], targets: np.ndarray) -> None:
+        """把一组主体一起搬到各自的新斑块上。
+
+        结果与逐个调用 `move.to` 一致，但不需要逐个检查主体是否在地上，
+        占据数组和人口图层也只整体更新一次。
+
+        Args:
+            agents: 要搬动的主体，都在这个图层上。
+            targets: 每个主体的新斑块（展平后的索引），必须是互不相同的空斑块。
+        """
+        targets = np.asarray(targets, dtype=int)
+        origins = np.array([self.flat_index(agent.at) for agent in agents], dtype=int)
+        for agent, cell in zip(agents, self.cells_at(targets)):
+            agent.at.agents.hand_over(agent, cell.agents)
+        for arr, empty in (
+            (self.occupancy, -1),
+            *((arr, 0.0) for arr in self.population.values()),
+            *((arr, False) for arr in self.presence.values()),
+        ):
+            flat = arr.reshape(-1)
+            flat[targets] = flat[origins]
+            flat[origins] = empty
+
+    def free_cells(self, where: Optional[np.ndarray] = None) -> ActorsList:
+        """在满足条件的斑块里，选出还没有主体占据的。
+
+        Args:
+            where: 与图层形状一致的布尔数组，默认为所有斑块。
+
+        Returns:
+            按行优先顺序排列的空斑块列表。
+        """
+        free = self.occupancy < 0
+        if where is not None:
+            free &= where
+        return ActorsList(self.model, self.cells_at(np.flatnonzero(free)))
+
+    def random_cells(self, size: int, where: np.ndarray) -> ActorsList:
+        """在满足条件的斑块里不重复地随机选出一些。
+
+        随机数的用法与 `ActorsList.random.choice` 一致，
+        但只有被选中的斑块才需要存在（或者被创建）。
+
+        Args:
+            size: 选出的斑块数量，不能多于满足条件的斑块。
+            where: 与图层形状一致的布尔数组。
+
+        Returns:
+            按行优先顺序排列的斑块列表。
+        """
+        candidates = np.flatnonzero(where)
+        chosen = self.model.rng.choice(
+            np.arange(len(candidates)), size=size, replace=False
+        )
+        chosen.sort()
+        return ActorsList(self.model, self.cells_at(candidates[chosen]))
+
+    def populate(self, breed: type, size: int, where: np.ndarray) -> ActorsList:
+        """在满足条件的斑块里随机选出一些，各放上一个新的主体。
+
+        与 `ActorsList.random.new` 的结果一致。
+        """
+        cells = self.random_cells(size, where)
+        agents = [cell.agents.new(breed_cls=breed, singleton=True) for cell in cells]
+        return ActorsList(self.model, agents)
+
+    def _add_attribute(
+        self,
+        data: np.ndarray,
+        attr_name: Optional[str] = None,
+        flipud: bool = False,
+        apply_mask: bool = False,
+    ) -> None:
+        # 地形属性和水体整体写进数组，而不是逐个斑块设置
+        if attr_name not in self.terrain and attr_name != "is_water":
+            super()._add_attribute(
+                data, attr_name, flipud=flipud, apply_mask=apply_mask
+            )
+            return
+        try:
+            data = np.asarray(data).reshape(self.shape2d)
+        except ValueError as e:
+            raise ValueError(
+                f"Data shape does not match raster shape. "
+                f"Expected {self.shape2d}, received {data.shape}."
+            ) from e
+        if apply_mask:
+            data = np.where(self.mask, data, np.nan)
+        if flipud:
+            data = np.flipud(data)
+        if attr_name == "is_water":
+            self.water = data.astype(bool).astype(np.int8)
+            self.invalidate_suitability()
+            return
+        self._attributes.add(attr_name)
+        self.terrain[attr_name] = data.astype(TERRAIN_DTYPES[attr_name])
+        if attr_name != "lim_h":
+            self.invalidate_suitability()
+
+    def get_raster(self, attr_name: Optional[str] = None, update: bool = True):
+        if attr_name in SUITABILITY_LAYERS or attr_name == "near_water":
+            return self.suitability[attr_name].reshape(self.shape3d).copy()
+        if attr_name in POPULATION_LAYERS:
+            return self.population[attr_name].reshape(self.shape3d).copy()
+        if attr_name in self.terrain:
+            return self.terrain[attr_name].reshape(self.shape3d).copy()
+        return super().get_raster(attr_name=attr_name, update=update)
+
+
 class Env(BaseNature):
     """
     环境类，用于管理模型中的环境信息。
@@ -279,24 +704,35 @@ class Env(BaseNature):
         self.add_initial_farmers(RiceFarmer, self.p.get("init_rice_farmers", 0))
 
     def setup_dem(self):
-        """创建数字高程模型并设置为主图层"""
+        """创建数字高程模型并设置为主图层。
+
+        如果配置了 `ds.cache`，预处理好的图层会被缓存起来，
+        之后的模型直接内存映射读取，不必再解码 GeoTIFF。
+        """
+        layers, meta = landscape_bundle(
+            dem=self.ds.dem,
+            slope=self.ds.slope,
+            lim_h=self.ds.lim_h,
+            cache=self.ds.get("cache"),
+        )
         self.dem = self.create_module(
-            raster_file=self.ds.dem,
+            module_cls=CompetingModule,
             cell_cls=CompetingCell,
-            attr_name="elevation",
             major_layer=True,
-            apply_raster=True,
+            lazy_cells=self.p.get("lazy_cells", False),
+            **meta,
         )
-        arr = self._open_rasterio(self.ds.slope)
-        self.dem.apply_raster(arr, attr_name="slope")
-        arr = self._open_rasterio(self.ds.lim_h)
-        self.dem.apply_raster(arr, attr_name="lim_h")
+        self.dem.load_terrain(layers)
+        self.dem.neighbourhood.build(self.max_travel_distance)
 
-    def _open_rasterio(self, source: str) -> np.ndarray:
-        with rasterio.open(source) as dataset:
-            arr = dataset.read(1)
-            arr = np.where(arr < 0, np.nan, arr)
-        return arr.reshape((1, arr.shape[0], arr.shape[1]))
+    @property
+    def max_travel_distance(self) -> int:
+        """所有主体中最远的移动距离，邻域索引需要预先计算到这个半径"""
+        distances = (
+            self.model.settings.get(breed.__name__, {}).get("max_travel_distance", 5)
+            for breed in (Farmer, Hunter, RiceFarmer)
+        )
+        return int(max(distances))
 
     def step(self) -> None:
         """
@@ -318,14 +754,15 @@ class Env(BaseNature):
         Returns:
             本次新添加的狩猎采集者列表。
         """
-        available_cells = self.major_layer.cells_lst.select({"is_water": False})
+        layer = self.major_layer
+        available = layer.mask & ~layer.suitability["is_water"]
         ratio = float(ratio)
         if ratio.is_integer():
             num = int(ratio)
         else:
-            num = int(len(available_cells) * ratio)
-        hunters = available_cells.random.new(Hunter, size=num, replace=False)
-        init_min, init_max = hunters[0].params.init_size
+            num = int(available.sum() * ratio)
+        hunters = layer.populate(Hunter, num, available)
+        init_min, init_max = hunters[0].frozen.init_size
         hunters.apply(lambda h: h.random_size(init_min, init_max))
         return hunters
 
@@ -347,27 +784,21 @@ class Env(BaseNature):
 
         # 根据农民类型选择合适的可耕地
         if farmer_cls == RiceFarmer:
-            arable = self.dem.get_raster("is_rice_arable").reshape(self.dem.shape2d)
+            arable = self.dem.suitability["is_rice_arable"]
         else:
-            arable = self.dem.get_raster("is_arable").reshape(self.dem.shape2d)
-
-        arable_cells = ActorsList(self.model, self.dem.array_cells[arable.astype(bool)])
+            arable = self.dem.suitability["is_arable"]
         # 过滤出没有主体的格子
-        valid_cells = arable_cells.select(lambda c: c.agents.has() == 0)
+        valid = arable & (self.dem.occupancy < 0)
 
         # 如果可耕地数量不够，则减少农民数量
-        farmers_num = min(num, len(valid_cells))
+        farmers_num = min(num, int(valid.sum()))
         if farmers_num == 0:
             return ActorsList(self.model, [])
 
         # 随机在满足条件的斑块上创建农民
-        farmers = valid_cells.random.new(
-            farmer_cls,
-            size=farmers_num,
-            replace=False,
-        )
+        farmers = self.dem.populate(farmer_cls, farmers_num, valid)
         # 根据 init_size 参数随机分配初始人口规模
-        init_min, init_max = farmers[0].params.init_size
+        init_min, init_max = farmers[0].frozen.init_size
         farmers.apply(lambda f: f.random_size(init_min, init_max))
         return farmers
 
@@ -388,22 +819,15 @@ class Env(BaseNature):
         else:
             farmers_num = np.random.poisson(self.params.get(lam_key, 0))
         # 从可耕地、没有主体的里面选
-        arable = self.dem.get_raster("is_arable").reshape(self.dem.shape2d)
-        arable_cells = ActorsList(self.model, self.dem.array_cells[arable.astype(bool)])
-        # Use lambda function to filter cells with no agents
-        valid_cells = arable_cells.select(lambda c: c.agents.has() == 0)
+        valid = self.dem.suitability["is_arable"] & (self.dem.occupancy < 0)
         # 如果可耕地数量不够，则减少农民数量
-        farmers_num = min(farmers_num, len(valid_cells))
+        farmers_num = min(farmers_num, int(valid.sum()))
         if farmers_num == 0:
             return ActorsList(self.model, [])
         # 随机在满足条件的斑块上创建农民
-        farmers = valid_cells.random.new(
-            farmer_cls,
-            size=farmers_num,
-            replace=False,
-        )
+        farmers = self.dem.populate(farmer_cls, farmers_num, valid)
         # 随机分配大小
         for farmer in farmers:
-            min_size, max_size = farmer.params.new_group_size
+            min_size, max_size = farmer.frozen.new_group_size
             farmer.size = farmer.random.randint(int(min_size), int(max_size))
         return farmers
@@ -18,6 +18,7 @@ import numpy as np
 from abses import alive_required
 
 from src.api.people import SiteGroup
+from src.api.store import Stored
 
 if TYPE_CHECKING:
     from src.api import Hunter, RiceFarmer
@@ -28,10 +29,13 @@ class Farmer(SiteGroup):
     农民
     """
 
-    def __init__(self, *arg, **kwargs) -> None:
-        super().__init__(*arg, **kwargs)
-        self._area = self.params.area
-        self._growth_rate = self.params.growth_rate
+    _growth_rate = Stored()
+    _area = Stored()
+
+    def _born(self, **kwargs) -> None:
+        super()._born(**kwargs)
+        self._area = self.frozen.area
+        self._growth_rate = self.frozen.growth_rate
         self.size = kwargs.get("size", self.min_size)
 
     @property
@@ -77,7 +81,7 @@ class Farmer(SiteGroup):
             结合华南气候条件下较高的生产力和更充沛的自然资源，将所需人均耕地设置为0.004平方公里，
             那么该单位人口上限即π * 2 * 2 / 0.004=3142人。
         """
-        capital_area = self.params.get("capital_area")
+        capital_area = self.frozen.get("capital_area")
         if not capital_area:
             raise ValueError("Capital area is not set in params.")
         max_size = np.pi * self.area**2 / capital_area
@@ -85,18 +89,18 @@ class Farmer(SiteGroup):
 
     def _convert_to_hunter(self) -> Hunter | Self:
         # 如果人数大于不能转化的阈值，就直接返回自身
-        cond1 = self.size <= self.params.convert_threshold.get("to_hunter")
+        cond1 = self.size <= self.frozen.convert_threshold.get("to_hunter")
         # 概率小于转化概率
-        cond2 = self.random.random() < self.params.convert_prob.get("to_hunter", 0.0)
+        cond2 = self.random.random() < self.frozen.convert_prob.get("to_hunter", 0.0)
         # 满足上述两个条件就转化
         return self._cell.convert(self, to="Hunter") if cond1 & cond2 else self
 
     def _convert_to_rice(self) -> RiceFarmer | Self:
         """转化成水稻农民"""
         # 人数大于水稻所需最小人数
-        cond1 = self.size >= self.params.convert_threshold.get("to_rice", 0)
+        cond1 = self.size >= self.frozen.convert_threshold.get("to_rice", 0)
         # 概率小于转化概率
-        cond2 = self.random.random() < self.params.convert_prob.get("to_rice", 0.0)
+        cond2 = self.random.random() < self.frozen.convert_prob.get("to_rice", 0.0)
         # 所处地块适宜水稻生存
         cond3 = self._cell.is_rice_arable
         return (
@@ -119,7 +123,7 @@ class Farmer(SiteGroup):
         """
         # 检测概率是否够产生小队
         if diffuse_prob is None:
-            diffuse_prob = self.params.get("diffuse_prob", 0.0)
+            diffuse_prob = self.frozen.get("diffuse_prob", 0.0)
         if self.random.random() < diffuse_prob:
             return super().diffuse(group_range=group_range)
         return None
@@ -128,15 +132,15 @@ class Farmer(SiteGroup):
     def complicate(self, complexity: float | None = None) -> Self:
         """农民的复杂化，耕地上限再增加耕地密度增加、人口增长率下降。人口增长率的下降比例也为复杂化系数的值。"""
         if complexity is None:
-            complexity = self.params.get("complexity", 0.0)
+            complexity = self.frozen.get("complexity", 0.0)
         self.growth_rate *= 1 - complexity
-        self.area += self.params.area * (1 - complexity)
+        self.area += self.frozen.area * (1 - complexity)
 
     def loss(self) -> None:
         """农民的损失，人口增长率下降。"""
-        if self.random.random() < self.params.loss.prob:
-            self.size *= 1 - self.params.loss.rate
+        if self.random.random() < self.frozen.loss.prob:
+            self.size *= 1 - self.frozen.loss.rate
 
-    def step(self):
-        super().step()
+    def act(self):
+        super().act()
         self.loss()
@@ -25,13 +25,13 @@ class Hunter(SiteGroup):
     @property
     def max_size(self) -> int:
         """单位主体人口最大值：普通情况100，临近水体500"""
-        if not self.on_earth:
+        if (cell := self.at) is None:
             return 100_000_000
 
         # 检查是否临近水体
-        if self.is_near_water():
-            return self.params.max_size_water
-        return self.params.max_size
+        if cell.near_water:
+            return self.frozen.max_size_water
+        return self.frozen.max_size
 
     def is_near_water(self) -> bool:
         """检查是否临近水体（相邻格子有水体）
@@ -39,10 +39,9 @@ class Hunter(SiteGroup):
         Returns:
             如果相邻格子（包括对角线）有水体，返回 True，否则返回 False
         """
-        if not self.on_earth:
+        if (cell := self.at) is None:
             return False
-        cells = self.at.neighboring(radius=1, moore=True, include_center=False)
-        return any(cells.apply(lambda c: c.is_water))
+        return cell.near_water
 
     @property
     def is_complex(self) -> bool:
@@ -51,7 +50,7 @@ class Hunter(SiteGroup):
         returns:
             是否是复杂狩猎采集者
         """
-        return self.size > self.params.is_complex if self.on_earth else False
+        return self.size > self.frozen.is_complex if self.on_earth else False
 
     @alive_required
     def merge(self, other_hunter: Hunter) -> bool:
@@ -96,6 +95,29 @@ class Hunter(SiteGroup):
         # 没成功再看转化水稻农民的结果
         return self._convert_to_rice(radius=radius, moore=moore)
 
+    def _has_neighbour(self, layer_name: str, radius: int, moore: bool) -> bool:
+        """周围（不含自身所在的格子）是否有某类主体"""
+        layer = self.at.layer
+        cells = layer.neighbours(self.at, radius=radius, moore=moore)
+        return bool(layer.presence[layer_name].ravel()[cells].any())
+
+    def can_convert(self, to: str, radius: int = 1, moore: bool = False) -> bool:
+        """除了转化概率以外，是否满足转化成某类农民的条件：
+        周围有这类农民，并且目前的土地适合这类农民耕种。
+
+        Args:
+            to (str): 转化成的主体类型，`Farmer` 或 `RiceFarmer`。
+            radius (int): 搜索的半径范围，默认为周围一格。
+            moore (bool): 是否使用Moore邻域进行搜索。
+        """
+        if to == "Farmer":
+            neighbour = self._has_neighbour("farmers", radius=radius, moore=moore)
+            return neighbour and self.at.is_arable
+        if to == "RiceFarmer":
+            neighbour = self._has_neighbour("rice_farmers", radius=radius, moore=moore)
+            return neighbour and self.at.is_rice_arable
+        raise TypeError(f"Hunter can only convert to farmers, not {to}.")
+
     def _convert_to_farmer(self, radius: int = 1, moore: bool = False) -> Self | Farmer:
         """狩猎采集者可能转化为农民，需要满足以下条件：
         1. 周围有农民
@@ -112,16 +134,13 @@ class Hunter(SiteGroup):
             如果没有转化，返回自身。
             如果成功转化，返回转化后的主体。
         """
-        # 周围有农民
-        cells = self.at.neighboring(radius=radius, moore=moore)
-        cond1 = any(cells.apply(lambda c: c.agents.has(Farmer)))
-        # 且目前的土地是可耕地
-        cond2 = self.at.is_arable
+        # 周围有农民，且目前的土地是可耕地
+        cond1 = self.can_convert("Farmer", radius=radius, moore=moore)
         # 转化概率小于阈值
-        convert_prob = self.params.convert_prob.get("to_farmer", 0.0)
-        cond3 = self.random.random() < convert_prob
+        convert_prob = self.frozen.convert_prob.get("to_farmer", 0.0)
+        cond2 = self.random.random() < convert_prob
         # 同时满足上述条件，狩猎采集者转化为农民
-        return self.at.convert(self, "Farmer") if cond1 and cond2 and cond3 else self
+        return self.at.convert(self, "Farmer") if cond1 and cond2 else self
 
     def _convert_to_rice(
         self, radius: int = 1, moore: bool = False
@@ -141,18 +160,13 @@ class Hunter(SiteGroup):
             如果没有转化，返回自身。
             如果成功转化，返回转化后的主体。
         """
-        # 周围有水稻农民
-        cells = self.at.neighboring(radius=radius, moore=moore)
-        cond1 = any(cells.apply(lambda c: c.agents.has(RiceFarmer)))
-        # 且目前的土地是可耕地
-        cond2 = self.at.is_rice_arable
+        # 周围有水稻农民，且目前的土地适合种水稻
+        cond1 = self.can_convert("RiceFarmer", radius=radius, moore=moore)
         # 转化概率小于阈值
-        convert_prob = self.params.convert_prob.get("to_rice", 0.0)
-        cond3 = self.random.random() < convert_prob
+        convert_prob = self.frozen.convert_prob.get("to_rice", 0.0)
+        cond2 = self.random.random() < convert_prob
         # 同时满足上述条件，狩猎采集者转化为农民
-        return (
-            self.at.convert(self, "RiceFarmer") if cond1 and cond2 and cond3 else self
-        )
+        return self.at.convert(self, "RiceFarmer") if cond1 and cond2 else self
 
     @alive_required
     def move_one(self, radius: int = 1, cell_now: Optional[PatchCell] = None) -> None:
@@ -181,11 +195,11 @@ class Hunter(SiteGroup):
 
     def loss(self) -> None:
         """狩猎采集者的损失，按概率减少人口。"""
-        if self.random.random() < self.params.loss.prob:
-            self.size *= 1 - self.params.loss.rate
+        if self.random.random() < self.frozen.loss.prob:
+            self.size *= 1 - self.frozen.loss.rate
 
-    def step(self):
-        """step of a hunter."""
-        super().step()
+    def act(self):
+        """除了人口增长以外，狩猎采集者每一步的行为。"""
+        super().act()
         self.loss()
         self.move_one()
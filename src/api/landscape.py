@@ -0,0 +1,341 @@
+#!/usr/bin/env python 3.11.0
+# -*-coding:utf-8 -*-
+# @Author  : Shuang (Twist) Song
+# @Contact   : SongshGeo@gmail.com
+# GitHub   : https://github.com/SongshGeo
+# Website: https://cv.songshgeo.com/
+
+"""由地形栅格整体计算的图层。
+
+这里的函数只处理 NumPy 数组，不依赖于斑块对象，
+判断规则与 `CompetingCell` 上对应的属性保持一致。
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+# 由高程、坡度和水体派生出来的适宜性图层
+SUITABILITY_LAYERS = (
+    "is_arable",
+    "is_rice_arable",
+    "is_only_arable",
+    "dem_suitable",
+    "slope_suitable",
+)
+
+
+def suitability_layers(
+    elevation: np.ndarray, slope: np.ndarray, is_water: np.ndarray
+) -> Dict[str, np.ndarray]:
+    """一次性计算所有的适宜性图层。
+
+    Args:
+        elevation: 高程（米）。
+        slope: 坡度（度）。
+        is_water: 是否是水体。
+
+    Returns:
+        以图层名为键的数组，包括：
+        - is_arable: 坡度不超过10度、海拔在0-200m之间且不是水体。
+        - is_rice_arable: 坡度不超过0.5度、海拔在0-200m之间且不是水体。
+        - is_only_arable: 只是普通可耕地而不是水稻可耕地。
+        - dem_suitable: 海拔 0-100: 2，100-200: 1，200以上: 0。
+        - slope_suitable: 坡度每2度降一级，0-2: 5，……，10以上: 0。
+    """
+    land = ((elevation < 200) & (elevation > 0)) & ~is_water.astype(bool)
+    is_arable = (slope <= 10) & land
+    is_rice_arable = (slope <= 0.5) & land
+    dem_suitable = np.select([elevation < 100, elevation < 200], [2, 1], default=0)
+    slope_suitable = np.select(
+        [slope < 2, slope < 4, slope < 6, slope < 8, slope < 10],
+        [5, 4, 3, 2, 1],
+        default=0,
+    )
+    return {
+        "is_arable": is_arable,
+        "is_rice_arable": is_rice_arable,
+        "is_only_arable": is_arable & ~is_rice_arable,
+        "dem_suitable": dem_suitable,
+        "slope_suitable": slope_suitable,
+    }
+
+
+def near_water(is_water: np.ndarray) -> np.ndarray:
+    """是否临近水体：周围8个格子（不含自身）里有水体。
+
+    相当于用去掉中心的 3x3 结构元对水体图层做一次膨胀，网格外视为非水体。
+
+    Args:
+        is_water: 二维的水体图层。
+
+    Returns:
+        与输入形状一致的布尔数组。
+    """
+    return within_radius(is_water, radius=1, moore=True)
+
+
+def within_radius(
+    presence: np.ndarray, radius: int = 1, moore: bool = False
+) -> np.ndarray:
+    """每个格子周围 `radius` 范围内（不含自身）是否有 `presence` 为真的格子。
+
+    与 `NeighbourhoodIndex.neighbours(annular=False)` 的邻居一致，
+    但对整个网格一次算完，网格外视为没有。
+
+    Args:
+        presence: 二维的布尔图层，例如某类主体的分布。
+        radius: 邻域的半径。
+        moore: 是否使用 Moore 邻域，否则使用冯诺依曼邻域。
+
+    Returns:
+        与输入形状一致的布尔数组。
+    """
+    height, width = presence.shape
+    padded = np.pad(presence.astype(bool), radius, constant_values=False)
+    result = np.zeros((height, width), dtype=bool)
+    for r in range(1, radius + 1):
+        for d_row, d_col in zip(*ring_offsets(r, moore=moore)):
+            row, col = radius + d_row, radius + d_col
+            result |= padded[row : row + height, col : col + width]
+    return result
+
+
+def smoothed_noise(
+    shape: Tuple[int, int], rng: np.random.Generator, smoothness: int = 0
+) -> np.ndarray:
+    """在 [0, 1) 之间均匀分布、但空间上自相关的随机数。
+
+    先生成白噪声，用 3x3 均值滤波平滑 `smoothness` 次，再把数值换成秩，
+    所以它可以直接替代 `rng.random(shape)`：按阈值切分时比例不变，
+    但相同类型的格子会连成片，更像真实的地形。
+
+    Args:
+        shape: 网格的行数和列数。
+        rng: 随机数生成器。
+        smoothness: 平滑的次数，越大连成的片越大。为0时就是白噪声。
+
+    Returns:
+        与网格形状一致的随机数。
+    """
+    field = rng.random(shape)
+    if smoothness <= 0:
+        return field
+    height, width = shape
+    offsets = list(zip(*ring_offsets(1, moore=True))) + [(0, 0)]
+    for _ in range(int(smoothness)):
+        padded = np.pad(field, 1, mode="edge")
+        field = sum(
+            padded[1 + dr : 1 + dr + height, 1 + dc : 1 + dc + width]
+            for dr, dc in offsets
+        ) / len(offsets)
+    ranks = np.empty(field.size)
+    ranks[np.argsort(field, axis=None, kind="stable")] = np.arange(field.size)
+    return (ranks / field.size).reshape(shape)
+
+
+def toy_landscape(
+    shape: Tuple[int, int],
+    arable_ratio: float = 0.1,
+    water_ratio: float = 0.2,
+    rice_arable_ratio: float = 0.05,
+    lim_h: float = 0.0,
+    smoothness: int = 0,
+    rng: Optional[np.random.Generator] = None,
+) -> Dict[str, np.ndarray]:
+    """整体生成一个玩具地形。
+
+    每个格子先按 `water_ratio` 决定是否为水体；其余格子按 `arable_ratio`
+    决定是否为可耕地，可耕地里再按一定比例成为水稻可耕地（坡度更小）。
+
+    Args:
+        shape: 网格的行数和列数。
+        arable_ratio: 可耕地的比例。
+        water_ratio: 水体的比例。
+        rice_arable_ratio: 水稻可耕地的比例，在可耕地中的比例最多为20%。
+        lim_h: 陆地上狩猎采集者的人口上限。
+        smoothness: 大于0时使用平滑噪声，生成空间上连成片的地形。
+        rng: 随机数生成器。
+
+    Returns:
+        高程、坡度、人口上限和水体图层。
+    """
+    rng = np.random.default_rng() if rng is None else rng
+
+    def draw() -> np.ndarray:
+        return smoothed_noise(shape, rng, smoothness)
+
+    # 计算水稻可耕地在可耕地中的比例，限制最大为0.2（20%）
+    rice_in_arable_ratio = min(0.2, rice_arable_ratio / max(arable_ratio, 0.001))
+    is_water = draw() < water_ratio
+    is_arable = ~is_water & (draw() < arable_ratio)
+    is_rice = is_arable & (draw() < rice_in_arable_ratio)
+    elev, slope = draw(), draw()
+
+    # 非可耕地：海拔 0-1000，坡度 10-30
+    elevation = elev * 1000
+    slopes = 10 + slope * 20
+    # 可耕地：海拔 1-199，水稻可耕地坡度 0-0.5，普通可耕地坡度 0.6-9.9
+    elevation[is_arable] = 1 + elev[is_arable] * 198
+    slopes[is_arable] = 0.6 + slope[is_arable] * 9.3
+    slopes[is_rice] = slope[is_rice] * 0.5
+    # 水体：海拔为0，设置一个大坡度，确保不会被识别为可耕地
+    elevation[is_water] = 0
+    slopes[is_water] = 30
+    return {
+        "elevation": elevation,
+        "slope": slopes,
+        "lim_h": np.where(is_water, 0.0, lim_h),
+        "is_water": is_water,
+    }
+
+
+def ring_offsets(radius: int, moore: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """与中心距离恰好为 `radius` 的一圈格子的行、列偏移量。
+
+    Args:
+        radius: 环的半径，至少为1。
+        moore: 是否使用 Moore 邻域（切比雪夫距离），否则使用冯诺依曼邻域（曼哈顿距离）。
+
+    Returns:
+        行偏移和列偏移，按行优先顺序排列。
+    """
+    if radius < 1:
+        raise ValueError(f"Radius must be a positive int, got {radius}.")
+    steps = np.arange(-radius, radius + 1)
+    d_row, d_col = np.meshgrid(steps, steps, indexing="ij")
+    if moore:
+        distance = np.maximum(np.abs(d_row), np.abs(d_col))
+    else:
+        distance = np.abs(d_row) + np.abs(d_col)
+    on_ring = distance == radius
+    return d_row[on_ring], d_col[on_ring]
+
+
+def ring_csr(
+    shape: Tuple[int, int], radius: int, moore: bool = False
+) -> Tuple[np.ndarray, np.ndarray]:
+    """计算网格上每个格子一圈邻居的 CSR 索引。
+
+    第 `i` 个格子（按行优先展平）的邻居为 `indices[indptr[i]:indptr[i + 1]]`，
+    超出网格边界的邻居被去掉，顺序与按掩膜从网格中取出时一致。
+
+    Args:
+        shape: 网格的行数和列数。
+        radius: 环的半径。
+        moore: 是否使用 Moore 邻域。
+
+    Returns:
+        `indptr` 和 `indices` 两个数组。
+    """
+    height, width = shape
+    d_row, d_col = ring_offsets(radius, moore)
+    rows, cols = np.divmod(np.arange(height * width), width)
+    rows = rows[:, None] + d_row
+    cols = cols[:, None] + d_col
+    valid = (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+    indptr = np.zeros(height * width + 1, dtype=np.int64)
+    np.cumsum(valid.sum(axis=1), out=indptr[1:])
+    indices = (rows * width + cols)[valid]
+    return indptr, indices
+
+
+class NeighbourhoodIndex:
+    """规则网格上静态的邻域索引。
+
+    网格不会改变，所以每个半径、每种邻域的一圈邻居只需要计算一次，
+    之后查找邻居只是对 CSR 数组的切片，不再需要构造斑块列表。
+    """
+
+    def __init__(self, shape: Tuple[int, int]) -> None:
+        self.shape = tuple(shape)
+        self._rings: Dict[Tuple[int, bool], Tuple[np.ndarray, np.ndarray]] = {}
+
+    def build(self, max_radius: int, moores: Iterable[bool] = (False, True)) -> None:
+        """预先计算不超过 `max_radius` 的所有环"""
+        for moore in moores:
+            for radius in range(1, int(max_radius) + 1):
+                self.ring(radius, moore)
+
+    def ring(self, radius: int, moore: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """某一半径的一圈邻居的 CSR 索引，第一次用到时计算"""
+        key = (int(radius), bool(moore))
+        if key not in self._rings:
+            self._rings[key] = ring_csr(self.shape, *key)
+        return self._rings[key]
+
+    def neighbours(
+        self, index: int, radius: int = 1, moore: bool = False, annular: bool = True
+    ) -> np.ndarray:
+        """某个格子的邻居（展平后的索引），不包括格子本身。
+
+        Args:
+            index: 格子按行优先展平后的索引。
+            radius: 邻域半径。
+            moore: 是否使用 Moore 邻域。
+            annular: 只要距离恰好为 `radius` 的一圈，否则包括半径以内的所有格子。
+
+        Returns:
+            邻居格子的索引。
+        """
+        radii = [radius] if annular else range(1, radius + 1)
+        rings = []
+        for r in radii:
+            indptr, indices = self.ring(r, moore)
+            rings.append(indices[indptr[index] : indptr[index + 1]])
+        return rings[0] if len(rings) == 1 else np.concatenate(rings)
+
+    def gather(
+        self, indices: np.ndarray, radius: int = 1, moore: bool = False
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """一组格子各自的一圈邻居，按输入顺序拼接在一起。
+
+        Args:
+            indices: 格子按行优先展平后的索引。
+            radius: 邻居所在的那一圈的半径。
+            moore: 是否使用 Moore 邻域。
+
+        Returns:
+            每个邻居属于第几个输入的格子，以及邻居格子的索引。
+        """
+        indptr, neighbours = self.ring(radius, moore)
+        indices = np.asarray(indices, dtype=int)
+        starts = indptr[indices]
+        counts = indptr[indices + 1] - starts
+        owner = np.repeat(np.arange(len(indices)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(
+            np.cumsum(counts) - counts, counts
+        )
+        return owner, neighbours[np.repeat(starts, counts) + offsets]
+
+
+def pick_in_groups(
+    owner: np.ndarray, weights: np.ndarray, rng: np.random.Generator
+) -> Tuple[np.ndarray, np.ndarray]:
+    """在每一组里按权重随机选出一个，每组只用一个随机数。
+
+    与 `search_cell` 里的加权选择规则一致：空值和负数的权重当作0，
+    一组的权重全为0时组内等概率选择。
+
+    Args:
+        owner: 每个候选属于哪一组，需要按组排好序。
+        weights: 每个候选的权重。
+        rng: 随机数生成器。
+
+    Returns:
+        有候选的组，以及每组选中的候选的位置。
+    """
+    weights = np.nan_to_num(np.asarray(weights, dtype=float))
+    weights[weights < 0] = 0.0
+    groups, first = np.unique(owner, return_index=True)
+    counts = np.diff(np.append(first, len(owner)))
+    totals = np.add.reduceat(weights, first) if len(first) else weights[:0]
+    uniform = totals == 0
+    weights = np.where(np.repeat(uniform, counts), 1.0, weights)
+    totals = np.where(uniform, counts, totals)
+    cumulative = np.cumsum(weights)
+    target = cumulative[first] - weights[first] + rng.random(len(groups)) * totals
+    chosen = np.searchsorted(cumulative, target, side="right")
+    return groups, np.clip(chosen, first, first + counts - 1)
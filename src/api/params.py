@@ -0,0 +1,111 @@
+#!/usr/bin/env python 3.11.0
+# -*-coding:utf-8 -*-
+# @Author  : Shuang (Twist) Song
+# @Contact   : SongshGeo@gmail.com
+# GitHub   : https://github.com/SongshGeo
+# Website: https://cv.songshgeo.com/
+
+"""冻结的参数快照。
+
+每读一次 `DictConfig` 的节点都要经过 OmegaConf 的解析，
+而主体每一步都要读好几次参数。这里把每一部分配置（例如 `Farmer`、`convert`）
+解析一次，转换成只读的普通 Python 对象，之后直接读取。
+
+参数仍然可以通过主体的 `params` 修改：拿到可以修改的 `params` 时，
+这类主体的快照会被丢弃，下次使用时重新生成。
+直接修改 `model.settings` 之后，需要调用 `ParamsCache.of(model).thaw()`。
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Dict, Iterator, Mapping, Optional
+
+from omegaconf import DictConfig, OmegaConf
+
+if TYPE_CHECKING:
+    from abses import MainModel
+
+
+class FrozenParams(Mapping):
+    """只读的参数记录。
+
+    和 `DictConfig` 一样可以用属性或者 `get` 读取，嵌套的字典也是 `FrozenParams`，
+    列表变成元组。
+    """
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data: Mapping[str, Any]) -> None:
+        frozen = {key: _freeze(value) for key, value in data.items()}
+        object.__setattr__(self, "_data", frozen)
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self._data[name]
+        except KeyError as e:
+            raise AttributeError(name) from e
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"Frozen params are read-only, can't set '{name}'.")
+
+    def __getitem__(self, key: str) -> Any:
+        return self._data[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return f"FrozenParams({self._data})"
+
+    def __reduce__(self):
+        return (FrozenParams, (self._data,))
+
+
+def _freeze(value: Any) -> Any:
+    """把解析后的配置值转换成只读的对象"""
+    if isinstance(value, Mapping):
+        return FrozenParams(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def freeze(node: Optional[DictConfig | Mapping]) -> FrozenParams:
+    """解析一个配置节点，得到它的快照"""
+    if node is None:
+        return FrozenParams({})
+    if isinstance(node, DictConfig):
+        node = OmegaConf.to_container(node, resolve=True)
+    return FrozenParams(node)
+
+
+class ParamsCache:
+    """一个模型里各部分配置的快照，第一次使用时生成"""
+
+    def __init__(self, model: MainModel) -> None:
+        self.model = model
+        self._frozen: Dict[str, FrozenParams] = {}
+
+    @classmethod
+    def of(cls, model: MainModel) -> ParamsCache:
+        """模型的参数快照，第一次使用时创建"""
+        cache = model.__dict__.get("_params_cache")
+        if cache is None:
+            cache = model.__dict__["_params_cache"] = cls(model)
+        return cache
+
+    def __getitem__(self, name: str) -> FrozenParams:
+        frozen = self._frozen.get(name)
+        if frozen is None:
+            frozen = self._frozen[name] = freeze(self.model.settings.get(name))
+        return frozen
+
+    def thaw(self, name: Optional[str] = None) -> None:
+        """丢弃某一部分（默认为全部）配置的快照，下次使用时重新生成"""
+        if name is None:
+            self._frozen.clear()
+        else:
+            self._frozen.pop(name, None)
@@ -9,24 +9,86 @@
 根据不同具体类别的主体需求，部分功能也会被覆写。
 """
 
+from __future__ import annotations
+
 from numbers import Number
-from typing import Optional, Self, Tuple
+from typing import TYPE_CHECKING, Optional, Self, Tuple
 
 import numpy as np
 import pandas as pd
 from abses import Actor, PatchCell, alive_required
 
+from src.api.params import FrozenParams, ParamsCache
+from src.api.store import AgentStore, Stored
+
+if TYPE_CHECKING:
+    from abses import MainModel
+    from omegaconf import DictConfig
+
 
 class SiteGroup(Actor):
-    """原始的聚落"""
+    """原始的聚落。
+
+    人口规模等属性保存在模型的主体仓库（`AgentStore`）里，
+    每个主体占据所属类型数组中的一个槽位。
+    """
+
+    _size = Stored()
+    _min_size = Stored()
+    _max_size = Stored()
 
     def __init__(self, *arg, **kwargs) -> None:
         super().__init__(*arg, **kwargs)
-        self._min_size = self.params.get("min_size", 0.0)
-        self._max_size = self.params.get("max_size", 0.0)
+        self._born(**kwargs)
+
+    @classmethod
+    def spawn(cls, model: MainModel, **kwargs) -> Self:
+        """创建一个新的主体，与 `model.agents.new(cls, singleton=True)` 等价。
+
+        模型打开了 `reuse_agents` 时，优先重新使用同类主体死亡后留下的对象，
+        省去构造和注册一个新对象的开销。注意重新使用的对象会得到新的 `unique_id`，
+        之前保存的死亡主体的引用可能在之后的时间步里变成另一个活着的主体。
+        """
+        shell = AgentStore.of(model)[cls].take_shell()
+        if shell is None:
+            return model.agents.new(cls, singleton=True, **kwargs)
+        shell._revive(**kwargs)
+        return shell
+
+    def _revive(self, **kwargs) -> None:
+        """让死亡主体留下的对象重新成为一个新的主体"""
+        self.unique_id = next(self._ids[self.model])
+        self.model.register_agent(self)
+        self._cell = None
+        self._alive = True
+        self._birth_tick = self.time.tick
+        self._updated_ticks = []
+        self._setup()
+        self._born(**kwargs)
+
+    def _born(self, **kwargs) -> None:
+        """新主体的初始状态，新创建的和重新使用的主体都从这里开始"""
+        self._store = AgentStore.of(self.model)[type(self)]
+        self._slot = self._store.add(self)
+        self._min_size = self.frozen.get("min_size", 0.0)
+        self._max_size = self.frozen.get("max_size", 0.0)
         self.size = kwargs.get("size", self.min_size)
         self.source = self.breed
 
+    @property
+    def params(self) -> DictConfig:
+        """这类主体可以修改的参数。
+
+        拿到之后参数可能会被修改，所以这类主体的参数快照会在下次使用时重新生成。
+        """
+        ParamsCache.of(self.model).thaw(type(self).__name__)
+        return super().params
+
+    @property
+    def frozen(self) -> FrozenParams:
+        """这类主体参数的只读快照，每一步都要读的参数从这里读取"""
+        return ParamsCache.of(self.model)[type(self).__name__]
+
     @property
     def size(self) -> int:
         """人口规模，转化成整数"""
@@ -41,6 +103,33 @@ class SiteGroup(Actor):
             return
         size = min(size, self.max_size)
         self._size = size
+        # 同步所在图层的人口图层
+        if (cell := self.at) is not None:
+            cell.layer.record(cell, self)
+
+    @Actor.at.setter
+    def at(self, cell: PatchCell) -> None:
+        Actor.at.fset(self, cell)
+        # 同步主体仓库里记录的位置
+        if self._store is not None:
+            row, col = cell.indices
+            self._store.cell[self._slot] = row * cell.layer.width + col
+
+    @at.deleter
+    def at(self) -> None:
+        Actor.at.fdel(self)
+        if self._store is not None:
+            self._store.cell[self._slot] = -1
+
+    def die(self) -> None:
+        """死亡，并释放在主体仓库里的槽位（死亡时的属性值仍然可以读取）"""
+        super().die()
+        if self._store is None:
+            return
+        values = self._store.release(self._slot)
+        self._store = None
+        for column, value in values.items():
+            setattr(self, f"_{column}", value)
 
     @property
     def min_size(self) -> int:
@@ -81,7 +170,7 @@ class SiteGroup(Actor):
     def population_growth(self, growth_rate: Optional[float] = None) -> None:
         """人口增长"""
         if growth_rate is None:
-            growth_rate = self.params.growth_rate
+            growth_rate = self.frozen.growth_rate
         self.size = self._size + self._size * growth_rate
 
     @alive_required
@@ -102,7 +191,7 @@ class SiteGroup(Actor):
         """
         # 获取分散小组的最小-最大人数.
         if group_range is None:
-            group_range = self.params.get("new_group_size", (0, 0))
+            group_range = self.frozen.get("new_group_size", (0, 0))
         s_min, s_max = group_range
         # 如果当前的人数还不足以产生一支最小的小队，则不会产生
         if self.size < s_min:
@@ -147,11 +236,15 @@ class SiteGroup(Actor):
     def convert(self):
         """转化的行为。"""
 
+    def act(self):
+        """除了人口增长以外，每一步的行为。"""
+        self.convert()
+        self.diffuse()
+
     def step(self):
         """每一步的行为。"""
         self.population_growth()
-        self.convert()
-        self.diffuse()
+        self.act()
 
     def loss_in_competition(self, at: Optional[PatchCell] = None) -> None:
         """在竞争中失败"""
@@ -162,19 +255,36 @@ class SiteGroup(Actor):
 def search_cell(
     agent: SiteGroup, cell: PatchCell, radius: int = 1, **kwargs
 ) -> PatchCell:
-    """在周围寻找一个新的地方，能够让迁徙的人过去"""
+    """在周围寻找一个新的地方，能够让迁徙的人过去。
+
+    从 `radius` 开始一圈一圈向外找，直到最远移动距离 `max_travel_distance`。
+    邻居来自图层预先计算的邻域索引，能否停留与 `able_to_live` 的规则一致，
+    找到的格子按适宜度（`suitable_level`）加权随机选择。
+    """
     if cell is None:
         raise TypeError(f"Expect PatchCell, got {type(cell)}, r={radius}.")
-    # 先找到周围的格子
-    cells = cell.neighboring(
-        radius=radius, moore=False, include_center=False, annular=True
-    )
-    # 检查周围的格子是否符合当前主体的停留要求
-    selected_cells = cells.select(lambda c: c.able_to_live(agent))
-    # 如果有符合要求的格子，按适宜度加权随机选择
-    if len(selected_cells) > 0:
-        prob = selected_cells.apply(lambda c: c.suitable_level(agent))
-        return selected_cells.random.choice(prob=prob)
-    if radius < agent.params.get("max_travel_distance", 5):
-        return search_cell(agent, cell, radius=radius + 1, **kwargs)
+    layer = cell.layer
+    # 没有被其他主体占据、且适合当前主体停留的格子
+    occupancy = layer.occupancy.ravel()
+    vacant = (occupancy < 0) | (occupancy == agent.unique_id)
+    livable = vacant & layer.habitat(agent.breed).ravel()
+    max_distance = int(agent.frozen.get("max_travel_distance", 5))
+    for r in range(radius, max(radius, max_distance) + 1):
+        # 先找到周围一圈的格子，检查是否符合当前主体的停留要求
+        ring = layer.neighbours(cell, radius=r, moore=False, annular=True)
+        selected = ring[livable[ring]]
+        # 如果有符合要求的格子，按适宜度加权随机选择
+        if selected.size > 0:
+            prob = layer.suitable_levels(agent.breed).ravel()[selected]
+            chosen = _weighted_choice(agent.model.rng, selected, prob)
+            return layer.cell_at(chosen)
     return None
+
+
+def _weighted_choice(rng: np.random.Generator, items: np.ndarray, prob: np.ndarray):
+    """按权重随机选择一个，权重全为0时等概率选择"""
+    prob = np.nan_to_num(np.asarray(prob, dtype=float))
+    prob[prob < 0] = 0.0
+    total = prob.sum()
+    prob = prob / total if total else np.repeat(1 / len(prob), len(prob))
+    return items[rng.choice(len(items), size=1, replace=False, p=prob)[0]]
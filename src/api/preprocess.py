@@ -0,0 +1,151 @@
+#!/usr/bin/env python 3.11.0
+# -*-coding:utf-8 -*-
+# @Author  : Shuang (Twist) Song
+# @Contact   : SongshGeo@gmail.com
+# GitHub   : https://github.com/SongshGeo
+# Website: https://cv.songshgeo.com/
+
+"""预处理地形栅格，并缓存成可以内存映射的 `.npy` 文件包。
+
+解码 GeoTIFF 是每个模型初始化时最慢的一步，而一组实验的每次重复、
+每个参数组合用的都是同样的栅格。这里把对齐、掩膜之后的图层和由它们
+派生的适宜性图层一次性写进缓存目录，之后的模型直接内存映射读取。
+缓存以源文件的路径和修改时间为键，源文件变化后会自动重新生成。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, Mapping, Optional, Tuple
+
+import numpy as np
+import rasterio
+import rioxarray
+
+from src.api.landscape import near_water, suitability_layers
+
+# 缓存格式的版本，格式改变时更新，旧的缓存就不会再被使用
+BUNDLE_VERSION = 2
+# 缓存包里的地形图层（其余是派生的适宜性图层）
+TERRAIN_LAYERS = ("elevation", "slope", "lim_h", "mask")
+# 保存在图层数组里的地形属性及其数据类型，缓存包里的图层也是这个类型
+TERRAIN_DTYPES = {"elevation": np.float32, "slope": np.float32, "lim_h": np.float32}
+
+Layers = Dict[str, np.ndarray]
+
+
+def bundle_key(sources: Mapping[str, str]) -> str:
+    """由源文件的路径、修改时间和大小生成缓存的键"""
+    items = [BUNDLE_VERSION]
+    for name, source in sorted(sources.items()):
+        stat = os.stat(source)
+        items.append((name, os.path.abspath(source), stat.st_mtime_ns, stat.st_size))
+    return hashlib.sha1(json.dumps(items).encode()).hexdigest()[:16]
+
+
+def read_band(source: str) -> np.ndarray:
+    """读取栅格的第一个波段，小于0的值作为空值"""
+    with rasterio.open(source) as dataset:
+        arr = dataset.read(1)
+    return np.where(arr < 0, np.nan, arr)
+
+
+def read_landscape(dem: str, slope: str, lim_h: str) -> Tuple[Layers, dict]:
+    """解码 GeoTIFF，得到所有图层和图层的空间信息。
+
+    Args:
+        dem: 数字高程模型的路径，它决定了网格的形状、范围和坐标系。
+        slope: 坡度栅格的路径。
+        lim_h: 狩猎采集者人口上限栅格的路径。
+
+    Returns:
+        图层和空间信息。空间信息可以直接传给 `create_module`。
+    """
+    xda = rioxarray.open_rasterio(dem, masked=True).sel(band=1)
+    layers = {
+        "elevation": xda.to_numpy(),
+        "slope": read_band(slope),
+        "lim_h": read_band(lim_h),
+    }
+    # 与斑块的地形数组类型一致：模型直接使用内存映射，适宜性也和斑块自己计算的一样
+    for attr, dtype in TERRAIN_DTYPES.items():
+        layers[attr] = layers[attr].astype(dtype, copy=False)
+    layers["mask"] = xda.notnull().to_numpy()
+    elevation = layers["elevation"]
+    # 没有另外设置水体时，斑块按海拔判断是否为水体
+    is_water = (elevation <= 0) | np.isnan(elevation)
+    layers.update(
+        suitability_layers(
+            elevation=elevation, slope=layers["slope"], is_water=is_water
+        )
+    )
+    layers["is_water"] = is_water
+    layers["near_water"] = near_water(is_water)
+    meta = {
+        "width": xda.rio.width,
+        "height": xda.rio.height,
+        "crs": xda.rio.crs.to_wkt(),
+        "total_bounds": list(xda.rio.bounds()),
+    }
+    return layers, meta
+
+
+def write_bundle(folder: Path, layers: Layers, meta: dict) -> None:
+    """把图层写成未压缩的 `.npy` 文件。
+
+    先写到临时目录再改名，并行的进程同时写同一个缓存也不会读到一半的文件。
+    """
+    folder = Path(folder)
+    folder.parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(dir=folder.parent, prefix=f".{folder.name}-"))
+    for name, arr in layers.items():
+        np.save(tmp / f"{name}.npy", np.ascontiguousarray(arr))
+    with open(tmp / "meta.json", "w", encoding="utf-8") as file:
+        json.dump({**meta, "layers": list(layers)}, file)
+    try:
+        os.rename(tmp, folder)
+    except OSError:
+        # 已经有别的进程写好了
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def load_bundle(folder: Path) -> Tuple[Layers, dict]:
+    """以写时复制的内存映射方式读取缓存包。
+
+    多个进程读取同一个缓存包时共用一份数据，
+    某个模型修改图层时只复制被修改的内存页，不会写回文件。
+    """
+    folder = Path(folder)
+    with open(folder / "meta.json", encoding="utf-8") as file:
+        meta = json.load(file)
+    names = meta.pop("layers")
+    layers = {name: np.load(folder / f"{name}.npy", mmap_mode="c") for name in names}
+    return layers, meta
+
+
+def landscape_bundle(
+    dem: str, slope: str, lim_h: str, cache: Optional[str] = None
+) -> Tuple[Layers, dict]:
+    """读取预处理好的地形图层。
+
+    Args:
+        dem: 数字高程模型的路径。
+        slope: 坡度栅格的路径。
+        lim_h: 狩猎采集者人口上限栅格的路径。
+        cache: 缓存目录。如果为空，每次都直接解码 GeoTIFF。
+
+    Returns:
+        图层和空间信息。使用缓存时图层是写时复制的内存映射数组。
+    """
+    if not cache:
+        return read_landscape(dem, slope, lim_h)
+    key = bundle_key({"dem": dem, "slope": slope, "lim_h": lim_h})
+    folder = Path(cache) / f"landscape-{key}"
+    if not (folder / "meta.json").exists():
+        write_bundle(folder, *read_landscape(dem, slope, lim_h))
+    return load_bundle(folder)
@@ -15,6 +15,6 @@ class RiceFarmer(Farmer):
 
     def convert(self) -> Farmer | Self:
         """可以转化会种植普通水稻的农民"""
-        cond1 = self.size < self.params.convert_threshold.get("to_farmer")
-        cond2 = self.random.random() < self.params.convert_prob.get("to_farmer", 0.0)
+        cond1 = self.size < self.frozen.convert_threshold.get("to_farmer")
+        cond2 = self.random.random() < self.frozen.convert_prob.get("to_farmer", 0.0)
         return self._cell.convert(self, to="Farmer") if cond1 & cond2 else self
@@ -0,0 +1,221 @@
+#!/usr/bin/env python 3.11.0
+# -*-coding:utf-8 -*-
+# @Author  : Shuang (Twist) Song
+# @Contact   : SongshGeo@gmail.com
+# GitHub   : https://github.com/SongshGeo
+# Website: https://cv.songshgeo.com/
+
+"""按主体类型保存属性的数组（structure of arrays）。
+
+每一类主体的人口规模、最小最大规模、人口增长率、耕地面积和所在的斑块
+都保存在同一组连续的数组里，每个主体占据其中一个槽位。
+主体对象仍然可以像以前一样读写这些属性，而模型也可以一次性处理
+同一类型的所有主体（例如整体计算人口增长）。
+
+仓库同时记录每类主体的数量和总人口（人口规模向上取整之后的和），
+主体出生、死亡和人口规模改变时同步更新，统计时不必遍历所有主体。
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from abses import MainModel
+
+    from src.api.people import SiteGroup
+
+# 保存在数组里的属性，及其默认值
+COLUMNS = {
+    "size": 0.0,
+    "min_size": 0.0,
+    "max_size": 0.0,
+    "growth_rate": 0.0,
+    "area": 0.0,
+}
+# 每类主体最多保留多少个可以重新使用的死亡主体
+SHELL_POOL_SIZE = 4096
+
+
+class BreedStore:
+    """某一类主体的属性数组。
+
+    主体死亡后它的槽位不会马上被重新使用，而是等到下一个时间步
+    （调用 `recycle` 之后）才会分配给新的主体，
+    所以一个时间步开始时取出的槽位，在这一步里始终对应同一个主体。
+
+    打开 `reuse` 时，死亡的主体对象也会留下来（同样等到下一个时间步），
+    之后创建同类主体时可以直接重新使用，而不必重新构造。
+    """
+
+    def __init__(self, breed: type, capacity: int = 64, reuse: bool = False) -> None:
+        self.breed = breed
+        self.reuse = reuse
+        self.agents = np.empty(capacity, dtype=object)
+        self.alive = np.zeros(capacity, dtype=bool)
+        # 主体所在斑块按行优先展平后的索引，不在斑块上时为 -1
+        self.cell = np.full(capacity, -1, dtype=int)
+        for column, default in COLUMNS.items():
+            setattr(self, column, np.full(capacity, default))
+        # 活着的主体数量，和它们的人口规模（向上取整）之和
+        self.count = 0
+        self.total = 0.0
+        self._top = 0
+        self._free: List[int] = []
+        self._released: List[int] = []
+        self.shells: List[SiteGroup] = []
+        self._buried: List[SiteGroup] = []
+
+    def __len__(self) -> int:
+        return int(self.alive.sum())
+
+    @property
+    def capacity(self) -> int:
+        """目前数组的长度"""
+        return len(self.alive)
+
+    def _grow(self) -> None:
+        """槽位用完时，把数组扩大一倍"""
+        extra = self.capacity
+        self.agents = np.concatenate([self.agents, np.empty(extra, dtype=object)])
+        self.alive = np.concatenate([self.alive, np.zeros(extra, dtype=bool)])
+        self.cell = np.concatenate([self.cell, np.full(extra, -1, dtype=int)])
+        for column, default in COLUMNS.items():
+            arr = getattr(self, column)
+            setattr(self, column, np.concatenate([arr, np.full(extra, default)]))
+
+    def add(self, agent: SiteGroup) -> int:
+        """给主体分配一个槽位"""
+        if self._free:
+            slot = self._free.pop()
+        else:
+            if self._top == self.capacity:
+                self._grow()
+            slot = self._top
+            self._top += 1
+        self.agents[slot] = agent
+        self.alive[slot] = True
+        self.cell[slot] = -1
+        for column, default in COLUMNS.items():
+            getattr(self, column)[slot] = default
+        self.count += 1
+        self.total += np.ceil(self.size[slot])
+        return slot
+
+    def release(self, slot: int) -> Dict[str, float]:
+        """主体死亡，释放它的槽位，返回它最后的属性值"""
+        values = {column: float(getattr(self, column)[slot]) for column in COLUMNS}
+        if self.reuse and len(self.shells) + len(self._buried) < SHELL_POOL_SIZE:
+            self._buried.append(self.agents[slot])
+        self.count -= 1
+        self.total -= np.ceil(self.size[slot])
+        self.agents[slot] = None
+        self.alive[slot] = False
+        self.cell[slot] = -1
+        self._released.append(slot)
+        return values
+
+    def set_size(self, slots: int | np.ndarray, sizes: float | np.ndarray) -> None:
+        """改变（一个或一组）主体的人口规模，同时更新总人口"""
+        delta = np.ceil(sizes) - np.ceil(self.size[slots])
+        self.total += float(np.sum(delta))
+        self.size[slots] = sizes
+
+    def recycle(self) -> None:
+        """之前释放的槽位（和留下的死亡主体）从现在开始可以分配给新的主体"""
+        self._free.extend(self._released)
+        self._released.clear()
+        self.shells.extend(self._buried)
+        self._buried.clear()
+
+    def take_shell(self) -> Optional[SiteGroup]:
+        """取出一个可以重新使用的死亡主体，没有的话返回 None"""
+        return self.shells.pop() if self.shells else None
+
+    def slots(self) -> np.ndarray:
+        """所有活着的主体的槽位"""
+        return np.flatnonzero(self.alive[: self._top])
+
+
+class AgentStore:
+    """一个模型里所有类型主体的属性数组"""
+
+    def __init__(self, reuse: bool = False) -> None:
+        self.reuse = reuse
+        self.breeds: Dict[type, BreedStore] = {}
+
+    @classmethod
+    def of(cls, model: MainModel) -> AgentStore:
+        """模型的主体仓库，第一次使用时创建。
+        配置里的 `model.reuse_agents` 决定是否重新使用死亡的主体。"""
+        store = model.__dict__.get("_agent_store")
+        if store is None:
+            reuse = bool(model.p.get("reuse_agents", False))
+            store = model.__dict__["_agent_store"] = cls(reuse=reuse)
+        return store
+
+    def __getitem__(self, breed: type) -> BreedStore:
+        if breed not in self.breeds:
+            self.breeds[breed] = BreedStore(breed, reuse=self.reuse)
+        return self.breeds[breed]
+
+    @property
+    def count(self) -> int:
+        """所有类型活着的主体数量"""
+        return sum(store.count for store in self.breeds.values())
+
+    @property
+    def total(self) -> float:
+        """所有类型主体的总人口"""
+        return sum(store.total for store in self.breeds.values())
+
+    def recycle(self) -> None:
+        """所有类型主体释放的槽位都可以重新使用了"""
+        for store in self.breeds.values():
+            store.recycle()
+
+    def release(self) -> None:
+        """运行结束后，放下对主体对象的引用。
+
+        `agents` 是对象数组，不参与循环垃圾回收，
+        主体、仓库和模型之间的引用环需要在这里断开，模型才能被释放。
+        之后仍可以读取主体的属性和人口统计，但不能再按槽位取出主体。
+        """
+        for store in self.breeds.values():
+            store.agents.fill(None)
+            store.shells.clear()
+            store._buried.clear()
+
+
+class Stored:
+    """保存在主体仓库数组里的属性。
+
+    主体活着时读写它槽位上的值；死亡之后槽位被释放，
+    仍然可以读到死亡时的值（例如转化之后查看原来主体的规模）。
+    """
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.name = name
+        self.column = name.lstrip("_")
+
+    def __get__(self, agent: Optional[SiteGroup], owner: type = None):
+        if agent is None:
+            return self
+        store = agent.__dict__.get("_store")
+        if store is None:
+            try:
+                return agent.__dict__[self.name]
+            except KeyError as e:
+                raise AttributeError(self.name) from e
+        return getattr(store, self.column)[agent.__dict__["_slot"]]
+
+    def __set__(self, agent: SiteGroup, value: float) -> None:
+        store = agent.__dict__.get("_store")
+        if store is None:
+            agent.__dict__[self.name] = value
+        elif self.column == "size":
+            store.set_size(agent.__dict__["_slot"], value)
+        else:
+            getattr(store, self.column)[agent.__dict__["_slot"]] = value
@@ -19,7 +19,8 @@ from hydra import compose, initialize
 from mesa.visualization import Slider, SolaraViz, make_plot_component
 from omegaconf import OmegaConf
 
-from src.api import CompetingCell, Env
+from src.api import CompetingCell, CompetingModule, Env
+from src.api.landscape import toy_landscape
 from src.core import Model
 
 # 加载可视化配置
@@ -44,84 +45,33 @@ class ToyEnv(Env):
         width = self.p.width
         height = self.p.height
         shape = height, width
-        arable_ratio = self.p.get("arable_ratio", 0.1)  # 默认可耕地比例为10%
-        water_ratio = self.p.get("water_ratio", 0.2)  # 水体比例
-        rice_arable_ratio = self.p.get("rice_arable_ratio", 0.05)  # 水稻可耕地比例，默认为5%
-
-        # 计算水稻可耕地在可耕地中的比例，限制最大为0.7（70%）
-        rice_in_arable_ratio = min(0.2, rice_arable_ratio / max(arable_ratio, 0.001))
-
         self.dem = self.create_module(
             shape=shape,
             cell_cls=CompetingCell,
+            module_cls=CompetingModule,
         )
-
-        # 计数器，用于调试
-        arable_count = 0
-        rice_count = 0
-        water_count = 0
-
-        # 遍历所有单元格，设置属性
-        for i in range(height):
-            for j in range(width):
-                cell = self.dem.array_cells[i, j]
-
-                # 设置水体
-                is_water = np.random.random() < water_ratio
-                cell.is_water = is_water
-                if is_water:
-                    water_count += 1
-                    # 水体的属性
-                    cell.elevation = 0
-                    cell.slope = 30  # 设置一个大坡度，确保不会被识别为可耕地
-                    continue
-
-                # 随机决定是否为可耕地
-                is_arable = np.random.random() < arable_ratio
-
-                if is_arable:
-                    arable_count += 1
-                    # 设置可耕地的属性
-                    cell.elevation = np.random.uniform(1, 199)
-
-                    # 随机决定是否为水稻可耕地，使用固定的比例
-                    if np.random.random() < rice_in_arable_ratio:
-                        rice_count += 1
-                        # 设置水稻可耕地的属性（坡度更小）
-                        cell.slope = np.random.uniform(0, 0.5)
-                    else:
-                        # 设置普通可耕地的属性（坡度较大但仍在可耕地范围内）
-                        cell.slope = np.random.uniform(0.6, 9.9)
-                else:
-                    # 非可耕地的随机属性
-                    cell.elevation = np.random.uniform(0, 1000)
-                    cell.slope = np.random.uniform(10, 30)
-
-                # 设置lim_h
-                cell.lim_h = self.p.lim_h
+        layers = toy_landscape(
+            shape,
+            arable_ratio=self.p.get("arable_ratio", 0.1),  # 默认可耕地比例为10%
+            water_ratio=self.p.get("water_ratio", 0.2),  # 水体比例
+            rice_arable_ratio=self.p.get("rice_arable_ratio", 0.05),  # 水稻可耕地比例
+            lim_h=self.p.lim_h,
+            smoothness=self.p.get("smoothness", 0),  # 大于0时生成连成片的地形
+            rng=self.model.rng,
+        )
+        for attr, data in layers.items():
+            self.dem.apply_raster(data, attr_name=attr)
 
         # 打印调试信息
         total_cells = width * height
+        water_count = layers["is_water"].sum()
         notes.append(f"总单元格数: {total_cells}")
         notes.append(f"水体数量: {water_count} ({water_count / total_cells : .2%})")
-        notes.append(f"可耕地数量: {arable_count} ({arable_count / total_cells : .2%})")
-        notes.append(f"水稻可耕地数量: {rice_count} ({rice_count / total_cells : .2%})")
-        notes.append(f"水稻可耕地目标比例: {rice_in_arable_ratio : .2%}")
 
         # 验证实际的可耕地和水稻可耕地
-        actual_arable = 0
-        actual_rice = 0
-        actual_only_arable = 0
-        for i in range(height):
-            for j in range(width):
-                cell = self.dem.array_cells[i, j]
-                if cell.is_arable:
-                    actual_arable += 1
-                if cell.is_rice_arable:
-                    actual_rice += 1
-                if cell.is_only_arable:
-                    actual_only_arable += 1
-
+        actual_arable = self.dem.suitability["is_arable"].sum()
+        actual_rice = self.dem.suitability["is_rice_arable"].sum()
+        actual_only_arable = self.dem.suitability["is_only_arable"].sum()
         notes.append(f"实际可耕地数量: {actual_arable} ({actual_arable / total_cells:.2%})")
         notes.append(f"实际水稻可耕地数量: {actual_rice} ({actual_rice / total_cells:.2%})")
         notes.append(
@@ -0,0 +1,197 @@
+#!/usr/bin/env python 3.11.0
+# -*-coding:utf-8 -*-
+# @Author  : Shuang (Twist) Song
+# @Contact   : SongshGeo@gmail.com
+# GitHub   : https://github.com/SongshGeo
+# Website: https://cv.songshgeo.com/
+
+"""按列保存模型变量的数据收集器。
+
+`abses` 的收集器每一步往每个变量的列表里追加一个值，取数据时再整体构造表格。
+这里每个变量是一列预先分配好的 NumPy 数组，长度按 `time.end` 确定，
+每一步只是往各列的同一行写入一个值；数组写满后长度翻倍。
+设置了溢写的目录时，写满的数组作为一块写入 Parquet 或 Feather 文件，
+数组从头开始重新写，内存占用不随运行的步数增长。
+
+表格在第一次读取时构造，之后一直使用同一个，直到再次收集数据。
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from abses.utils.datacollector import ABSESpyDataCollector, clean_to_reporter
+from abses.utils.logging import logger
+
+# 不知道运行多少步时，每一列先分配的长度
+DEFAULT_CAPACITY = 1024
+SPILL_FORMATS = ("parquet", "feather")
+
+
+def _dtype_of(value: Any) -> np.dtype:
+    """保存一个报告值所用的数组类型"""
+    if isinstance(value, (bool, np.bool_)):
+        return np.dtype(bool)
+    if isinstance(value, (int, np.integer)):
+        return np.dtype(np.int64)
+    if isinstance(value, (float, np.floating)):
+        return np.dtype(np.float64)
+    return np.dtype(object)
+
+
+def _promote(current: np.dtype, new: np.dtype) -> np.dtype:
+    """和 `pandas` 由列表构造列时一样：整数和小数合并为小数，其它混合的情况保存为对象"""
+    if current == new:
+        return current
+    numbers = {np.dtype(np.int64), np.dtype(np.float64)}
+    if current in numbers and new in numbers:
+        return np.dtype(np.float64)
+    return np.dtype(object)
+
+
+class ColumnarDataCollector(ABSESpyDataCollector):
+    """每个模型变量一列 NumPy 数组的数据收集器。
+
+    Parameters:
+        reports:
+            和 `abses` 的收集器一样的报告配置。
+        capacity:
+            每一列预先分配的行数。
+        spill_to:
+            数组写满时，分块写入的文件夹，默认不写入文件，而是扩大数组。
+        spill_format:
+            分块文件的格式，`parquet` 或者 `feather`，需要安装 `pyarrow`。
+    """
+
+    def __init__(
+        self,
+        reports: Dict[str, Dict[str, Any]],
+        capacity: int = DEFAULT_CAPACITY,
+        spill_to: Optional[str | Path] = None,
+        spill_format: str = "parquet",
+    ) -> None:
+        if spill_format not in SPILL_FORMATS:
+            raise ValueError(
+                f"Unknown spill format {spill_format}, use one of {SPILL_FORMATS}."
+            )
+        self.capacity = max(int(capacity), 1)
+        self.spill_to = None if spill_to is None else Path(spill_to)
+        self.spill_format = spill_format
+        self._columns: Dict[str, Optional[np.ndarray]] = {}
+        self._types: Dict[str, type] = {}
+        self._rows = 0
+        self._spilled = 0
+        self._chunks: List[Path] = []
+        self._frame: Optional[pd.DataFrame] = None
+        super().__init__(reports)
+
+    def __len__(self) -> int:
+        """已经收集的行数"""
+        return self._spilled + self._rows
+
+    def _new_model_reporter(self, name: str, reporter: Any) -> None:
+        """添加一个模型变量，它的列在收集到第一个值时分配"""
+        self.model_reporters[name] = clean_to_reporter(reporter)
+        self._columns[name] = None
+        self._types.pop(name, None)
+        self._frame = None
+
+    def _write(self, name: str, row: int, value: Any) -> None:
+        """写入一个值，必要时改变这一列的类型"""
+        column = self._columns[name]
+        if type(value) is not self._types.get(name):
+            dtype = _dtype_of(value)
+            if column is None:
+                column = np.empty(self.capacity, dtype=dtype)
+                # 收集开始之后才添加的变量，之前的行为空
+                if len(self):
+                    column = column.astype(object)
+                    column[:row] = None
+            elif (promoted := _promote(column.dtype, dtype)) != column.dtype:
+                column = column.astype(promoted)
+            self._columns[name] = column
+            self._types[name] = type(value)
+        column[row] = value
+
+    def _make_room(self) -> None:
+        """数组写满时，写入分块文件，或者把数组的长度翻倍"""
+        if self.spill_to is not None:
+            self._spill()
+            return
+        size = self.capacity
+        self.capacity = size * 2
+        for name, column in self._columns.items():
+            if column is None:
+                continue
+            grown = np.empty(self.capacity, dtype=column.dtype)
+            grown[:size] = column
+            self._columns[name] = grown
+
+    def _buffer_frame(self) -> pd.DataFrame:
+        """数组里还没有写入文件的行"""
+        rows = self._rows
+        return pd.DataFrame(
+            {
+                name: (
+                    np.full(rows, None, dtype=object)
+                    if column is None
+                    else column[:rows].copy()
+                )
+                for name, column in self._columns.items()
+            },
+            index=pd.RangeIndex(self._spilled, self._spilled + rows),
+        )
+
+    def _spill(self) -> None:
+        """把数组里的行写入一个分块文件，数组从头开始重新写"""
+        self.spill_to.mkdir(parents=True, exist_ok=True)
+        path = self.spill_to / f"model_vars_{len(self._chunks):05d}.{self.spill_format}"
+        chunk = self._buffer_frame().reset_index(drop=True)
+        if self.spill_format == "parquet":
+            chunk.to_parquet(path)
+        else:
+            chunk.to_feather(path)
+        self._chunks.append(path)
+        self._spilled += self._rows
+        self._rows = 0
+
+    def _read_chunk(self, path: Path) -> pd.DataFrame:
+        if self.spill_format == "parquet":
+            return pd.read_parquet(path)
+        return pd.read_feather(path)
+
+    def collect(self, model) -> None:
+        """把这一步所有模型变量的值写入各列的同一行"""
+        if self.model_reporters:
+            if self._rows == self.capacity:
+                self._make_room()
+            row = self._rows
+            for name, func in self.model_reporters.items():
+                self._write(name, row, func(model))
+            self._rows = row + 1
+            self._frame = None
+
+        if self.agent_reporters:
+            self._record_agents(model)
+
+    def get_model_vars_dataframe(self) -> pd.DataFrame:
+        """模型变量的表格，每个变量一列，索引是收集的次序。
+
+        表格在第一次读取时构造，再次收集数据之前返回同一个表格，不要直接修改它。
+        """
+        if self._frame is not None:
+            return self._frame
+        if not self.model_reporters:
+            logger.warning(
+                "No model reporters have been defined, returning empty DataFrame."
+            )
+            return pd.DataFrame()
+        frame = self._buffer_frame()
+        if self._chunks:
+            chunks = [self._read_chunk(path) for path in self._chunks]
+            frame = pd.concat([*chunks, frame], ignore_index=True)
+        self._frame = frame
+        return frame
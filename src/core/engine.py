@@ -0,0 +1,290 @@
+#!/usr/bin/env python 3.11.0
+# -*-coding:utf-8 -*-
+# @Author  : Shuang (Twist) Song
+# @Contact   : SongshGeo@gmail.com
+# GitHub   : https://github.com/SongshGeo
+# Website: https://cv.songshgeo.com/
+
+"""按阶段整体运行主体的引擎。
+
+默认情况下，模型每一步让每个主体依次执行自己的 `step`。
+把配置里的 `model.engine` 设置成 `vector` 之后，
+同一阶段的行为会对同一类型的所有主体一起计算，
+数据直接来自主体仓库（`AgentStore`）里的数组。
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Dict, Tuple
+
+import numpy as np
+
+from src.api import Farmer, Hunter, RiceFarmer
+from src.api.env import POPULATION_LAYERS
+from src.api.landscape import within_radius
+from src.api.params import FrozenParams, ParamsCache
+from src.api.store import AgentStore, BreedStore
+
+if TYPE_CHECKING:
+    from src.core.model import Model
+
+# 按顺序运行的主体类型
+BREEDS = (Farmer, RiceFarmer, Hunter)
+# 狩猎采集者转化成某类农民时，周围需要有的人口图层，和所在斑块需要满足的适宜性
+CONVERTIBLE = {
+    "Farmer": ("farmers", "is_arable"),
+    "RiceFarmer": ("rice_farmers", "is_rice_arable"),
+}
+
+Cohort = Dict[type, np.ndarray]
+
+
+class VectorEngine:
+    """按阶段整体运行所有主体。
+
+    每个时间步开始时记录下已经存在的主体（槽位），
+    这一步里新出生或者转化得到的主体要到下一步才开始行动，
+    与逐个主体运行时一致。
+    """
+
+    def __init__(self, model: Model) -> None:
+        self.model = model
+
+    @property
+    def store(self) -> AgentStore:
+        """模型的主体仓库"""
+        return AgentStore.of(self.model)
+
+    @property
+    def layer(self):
+        """主体所在的图层"""
+        return self.model.nature.major_layer
+
+    def params(self, breed: type) -> FrozenParams:
+        """某类主体参数的只读快照"""
+        return ParamsCache.of(self.model)[breed.__name__]
+
+    def cohort(self) -> Cohort:
+        """这一步开始时每类主体的槽位"""
+        return {breed: self.store[breed].slots() for breed in BREEDS}
+
+    def step(self) -> None:
+        """运行一个时间步：人口增长、转化、分散、损失，最后狩猎采集者移动"""
+        cohort = self.cohort()
+        for breed, slots in cohort.items():
+            self.growth(breed, slots)
+        self.convert(cohort)
+        self.diffuse(cohort)
+        for breed, slots in cohort.items():
+            self.loss(breed, slots)
+        self.move(cohort[Hunter])
+
+    def draw(self, slots: np.ndarray) -> np.ndarray:
+        """给每个主体抽一个 [0, 1) 之间的随机数"""
+        return self.model.rng.random(slots.size)
+
+    def alive(self, store: BreedStore, slots: np.ndarray) -> np.ndarray:
+        """仍然活着（没有死亡，也没有被转化）的槽位"""
+        return slots[store.alive[slots]]
+
+    def max_sizes(self, breed: type, slots: np.ndarray) -> np.ndarray:
+        """每个主体的人口上限，与各类主体的 `max_size` 一致"""
+        store = self.store[breed]
+        params = self.params(breed)
+        if issubclass(breed, Farmer):
+            return np.ceil(np.pi * store.area[slots] ** 2 / params.capital_area)
+        if issubclass(breed, Hunter):
+            cells = store.cell[slots]
+            near_water = self.layer.suitability["near_water"].ravel()
+            near = near_water[np.where(cells < 0, 0, cells)]
+            max_size = np.where(near, params.max_size_water, params.max_size)
+            return np.where(cells < 0, 100_000_000, max_size)
+        return np.ceil(store.max_size[slots])
+
+    def growth(self, breed: type, slots: np.ndarray) -> None:
+        """人口增长"""
+        store = self.store[breed]
+        slots = self.alive(store, slots)
+        params = self.params(breed)
+        size = store.size[slots]
+        self.resize(breed, slots, size + size * params.growth_rate)
+
+    def resize(self, breed: type, slots: np.ndarray, sizes: np.ndarray) -> None:
+        """改变人口规模，与 `size` 的设置规则一致：
+        超过上限的被限制在上限（农民同时复杂化），低于下限的死亡。"""
+        if slots.size == 0:
+            return
+        store = self.store[breed]
+        max_size = self.max_sizes(breed, slots)
+        dead = sizes < np.ceil(store.min_size[slots])
+        store.set_size(
+            slots, np.where(dead, store.size[slots], np.minimum(sizes, max_size))
+        )
+        if issubclass(breed, Farmer):
+            self.complicate(breed, slots[(sizes > max_size) & ~dead])
+        self.record(breed, slots[~dead])
+        for agent in store.agents[slots[dead]]:
+            agent.die()
+
+    def complicate(self, breed: type, slots: np.ndarray) -> None:
+        """农民的复杂化，与 `Farmer.complicate` 一致"""
+        store = self.store[breed]
+        params = self.params(breed)
+        complexity = params.get("complexity", 0.0)
+        growth_rate = store.growth_rate[slots] * (1 - complexity)
+        store.growth_rate[slots] = np.maximum(growth_rate, 0.0)
+        area = store.area[slots]
+        store.area[slots] = np.maximum(area, area + params.area * (1 - complexity))
+
+    def record(self, breed: type, slots: np.ndarray) -> None:
+        """把主体的人口规模写进所在图层的人口图层"""
+        store = self.store[breed]
+        cells = store.cell[slots]
+        on_layer = cells >= 0
+        sizes = np.ceil(store.size[slots][on_layer])
+        for name, cls in POPULATION_LAYERS.items():
+            if issubclass(breed, cls):
+                np.put(self.layer.population[name], cells[on_layer], sizes)
+
+    def convert(self, cohort: Cohort) -> None:
+        """转化。每类主体、每种转化各抽一组随机数，
+        只有抽中的主体才逐个检查其余条件并转化。"""
+        self._convert_farmers(*self._acting(Farmer, cohort))
+        self._convert_rice_farmers(*self._acting(RiceFarmer, cohort))
+        self._convert_hunters(*self._acting(Hunter, cohort))
+
+    def _convert_farmers(self, store: BreedStore, slots: np.ndarray) -> None:
+        """普通农民：先看是否转化成狩猎采集者，不成功再看是否转化成水稻农民"""
+        if slots.size == 0:
+            return
+        params = self.params(Farmer)
+        threshold, prob = params.convert_threshold, params.convert_prob
+        size = np.ceil(store.size[slots])
+        rice_arable = self.layer.suitability["is_rice_arable"].ravel()
+        to_hunter = self.draw(slots) < prob.get("to_hunter", 0.0)
+        to_hunter &= size <= threshold.get("to_hunter")
+        to_rice = self.draw(slots) < prob.get("to_rice", 0.0)
+        to_rice &= size >= threshold.get("to_rice", 0)
+        to_rice &= rice_arable[store.cell[slots]]
+        for i in np.flatnonzero(to_hunter | to_rice):
+            agent = store.agents[slots[i]]
+            for to, fired in (("Hunter", to_hunter[i]), ("RiceFarmer", to_rice[i])):
+                if fired and agent.at.convert(agent, to) is not agent:
+                    break
+
+    def _convert_rice_farmers(self, store: BreedStore, slots: np.ndarray) -> None:
+        """水稻农民：人数不足时转化成普通农民"""
+        if slots.size == 0:
+            return
+        params = self.params(RiceFarmer)
+        to_farmer = self.draw(slots) < params.convert_prob.get("to_farmer", 0.0)
+        threshold = params.convert_threshold.get("to_farmer")
+        to_farmer &= np.ceil(store.size[slots]) < threshold
+        for agent in store.agents[slots[to_farmer]]:
+            agent.at.convert(agent, "Farmer")
+
+    def _convert_hunters(self, store: BreedStore, slots: np.ndarray) -> None:
+        """狩猎采集者：周围有（水稻）农民、所在斑块适宜耕种时可能转化。
+
+        先抽随机数，再用这一步的“周围有农民”图层检查抽中的狩猎采集者，
+        不必为每个狩猎采集者查找邻居。
+        """
+        if slots.size == 0:
+            return
+        prob = self.params(Hunter).convert_prob
+        to_farmer = self.draw(slots) < prob.get("to_farmer", 0.0)
+        to_rice = self.draw(slots) < prob.get("to_rice", 0.0)
+        fired = to_farmer | to_rice
+        if not fired.any():
+            return
+        cells = store.cell[slots[fired]]
+        to_farmer[fired] &= self.convertible("Farmer").ravel()[cells]
+        to_rice[fired] &= self.convertible("RiceFarmer").ravel()[cells]
+        for i in np.flatnonzero(to_farmer | to_rice):
+            agent = store.agents[slots[i]]
+            for to, ready in (("Farmer", to_farmer[i]), ("RiceFarmer", to_rice[i])):
+                if ready and agent.at.convert(agent, to) is not agent:
+                    break
+
+    def convertible(self, to: str) -> np.ndarray:
+        """狩猎采集者可以转化成某类农民的斑块，与 `Hunter.can_convert` 一致：
+        周围有这类农民，并且斑块适合这类农民耕种。"""
+        layer = self.layer
+        name, arable = CONVERTIBLE[to]
+        nearby = within_radius(layer.presence[name], radius=1, moore=False)
+        return nearby & layer.suitability[arable]
+
+    def diffuse(self, cohort: Cohort) -> None:
+        """分散。农民按概率分散，狩猎采集者达到人口上限时分散"""
+        for breed in (Farmer, RiceFarmer):
+            store, slots = self._acting(breed, cohort)
+            if slots.size == 0:
+                continue
+            prob = self.params(breed).get("diffuse_prob", 0.0)
+            self._diffuse(breed, slots[self.draw(slots) < prob])
+        store, slots = self._acting(Hunter, cohort)
+        full = np.ceil(store.size[slots]) >= self.max_sizes(Hunter, slots)
+        self._diffuse(Hunter, slots[full])
+
+    def _diffuse(self, breed: type, slots: np.ndarray) -> None:
+        """决定分散的主体一起分出新的小队，与 `SiteGroup.diffuse` 的规则一致。
+
+        先一起抽取新小队的规模并减少原来主体的人口，
+        再为所有新小队同时寻找落脚的斑块（`search_cells`），
+        只有找到了斑块的小队才创建成新的主体。
+        """
+        store = self.store[breed]
+        slots = self.alive(store, slots)
+        params = self.params(breed)
+        s_min, s_max = params.get("new_group_size", (0, 0))
+        size = np.ceil(store.size[slots])
+        slots, size = slots[size >= s_min], size[size >= s_min]
+        if slots.size == 0:
+            return
+        random_size = self.model.rng.integers(
+            int(s_min), int(s_max), size=slots.size, endpoint=True
+        )
+        new_size = np.minimum(random_size, size)
+        origins = store.cell[slots].copy()
+        self.resize(breed, slots, size - new_size)
+        max_distance = int(params.get("max_travel_distance", 5))
+        targets = self.layer.search_cells(origins, breed.__name__, max_distance)
+        found = targets >= 0
+        cells = self.layer.cells_at(targets[found])
+        for cell, group_size in zip(cells, new_size[found]):
+            cell.agents.new(breed_cls=breed, singleton=True, size=group_size)
+
+    def loss(self, breed: type, slots: np.ndarray) -> None:
+        """损失。按概率减少人口"""
+        store = self.store[breed]
+        slots = self.alive(store, slots)
+        if slots.size == 0:
+            return
+        loss = self.params(breed).loss
+        slots = slots[self.draw(slots) < loss.prob]
+        self.resize(breed, slots, np.ceil(store.size[slots]) * (1 - loss.rate))
+
+    def move(self, slots: np.ndarray) -> None:
+        """没有定居的狩猎采集者一起移动，与 `Hunter.move_one` 的规则一致。
+
+        所有能移动的狩猎采集者同时在周围寻找空的斑块（`search_cells`），
+        选中同一个斑块时按随机的优先级决定谁过去，最后整体搬动。
+        移动之前各自原来的斑块在这一步里还算作被占据。
+        """
+        store = self.store[Hunter]
+        slots = self.alive(store, slots)
+        slots = slots[store.cell[slots] >= 0]
+        is_complex = self.params(Hunter).is_complex
+        slots = slots[np.ceil(store.size[slots]) <= is_complex]
+        if slots.size == 0:
+            return
+        max_distance = int(self.params(Hunter).get("max_travel_distance", 5))
+        targets = self.layer.search_cells(store.cell[slots], "Hunter", max_distance)
+        moved = targets >= 0
+        self.layer.relocate(store.agents[slots[moved]], targets[moved])
+
+    def _acting(self, breed: type, cohort: Cohort) -> Tuple[BreedStore, np.ndarray]:
+        """某类主体中，这一步开始时就存在、仍然活着且在图层上的"""
+        store = self.store[breed]
+        slots = self.alive(store, cohort[breed])
+        return store, slots[store.cell[slots] >= 0]
@@ -9,14 +9,23 @@
 处理一组实验的结果。
 """
 
+from copy import deepcopy
 from itertools import product
-from typing import Literal
+from pathlib import Path
+from typing import Literal, Optional
 
+import numpy as np
+import pandas as pd
 import seaborn as sns
 from abses import Experiment
 from abses.utils.func import with_axes
 from matplotlib import pyplot as plt
 from matplotlib.axes import Axes
+from omegaconf import DictConfig
+
+from src.api import Env
+from src.api.preprocess import landscape_bundle
+from src.workflow.analysis import batch_breakpoints, batch_rates
 
 try:
     from typing import TypeAlias
@@ -26,10 +35,92 @@ except ImportError:
 ActorType: TypeAlias = Literal["farmers", "rice", "hunters"]
 JobType: TypeAlias = Literal["len", "num"]
 
+# 断点分析结果在实验总结里的名称后缀，与配置中的 `final` 报告一致
+REPORT_NAMES = {"farmers": "farmer", "hunters": "hunters", "rice": "rice"}
+
 
 class MyExperiment(Experiment):
     """分析实验结果。"""
 
+    def share_landscape(self) -> Optional[DictConfig]:
+        """在主进程里准备好地形图层的缓存包，让所有子进程共享。
+
+        每个模型在 `Env.setup_dem` 里都会以写时复制的方式内存映射这个缓存包，
+        并行运行的模型共用操作系统页缓存里同一份数据，而不是各自解码、各存一份。
+        没有配置 `ds.cache` 时不准备缓存包，每个模型都读取 GeoTIFF。
+
+        Returns:
+            子进程使用的配置的副本，其中的数据和缓存都是绝对路径，实验本身的配置不变。
+            如果实验不使用 `Env` 的地形数据，或者没有配置缓存目录，返回空值。
+        """
+        nature_class = self._extra_kwargs.get("nature_class")
+        if not (isinstance(nature_class, type) and issubclass(nature_class, Env)):
+            return None
+        ds = self.cfg.get("ds")
+        if not ds or not ds.get("cache"):
+            return None
+        cfg = deepcopy(self.cfg)
+        # 子进程的工作目录可能不同，都使用绝对路径
+        for key in ("dem", "slope", "lim_h", "cache"):
+            cfg.ds[key] = str(Path(ds[key]).absolute())
+        landscape_bundle(
+            dem=cfg.ds.dem, slope=cfg.ds.slope, lim_h=cfg.ds.lim_h, cache=cfg.ds.cache
+        )
+        return cfg
+
+    def summary(self) -> pd.DataFrame:
+        """实验结果的总结，报告了整列数据（`series_*`）的主体在这里统一分析断点"""
+        return self.analyze_breakpoints(super().summary())
+
+    @staticmethod
+    def analyze_breakpoints(data: pd.DataFrame, min_size: int = 5) -> pd.DataFrame:
+        """同时分析所有运行的断点，以及断点前后的增长率。
+
+        每次运行在结束时用 `series_farmers` 这样的报告返回检测断点的整列数据，
+        这里把所有运行的数据合成一个二维数组（运行 x 时间），一起计算，
+        结果与每次运行的 `bkp_*`、`pre_*`、`post_*` 报告相同，
+        写入总结里同名的列，整列数据不再保留。运行的长度不同时，长度相同的运行一起计算。
+
+        Parameters:
+            data:
+                实验的总结，每一行是一次运行。
+            min_size:
+                切割后每一段最小的长度，与 `detect_breakpoints` 相同。
+
+        Returns:
+            加入了分析结果的总结。
+        """
+        columns = [f"series_{breed}" for breed in REPORT_NAMES]
+        result = data.drop(columns=[col for col in columns if col in data])
+        for breed, name in REPORT_NAMES.items():
+            if (column := f"series_{breed}") not in data:
+                continue
+            series = data[column].to_numpy()
+            lengths = np.array([len(values) for values in series])
+            bkps = np.zeros(len(data), dtype=int)
+            before, after = np.zeros(len(data)), np.zeros(len(data))
+            for length in np.unique(lengths):
+                rows = np.flatnonzero(lengths == length)
+                stacked = np.vstack(series[rows])
+                bkps[rows] = batch_breakpoints(stacked, min_size=min_size)
+                before[rows], after[rows] = batch_rates(stacked, bkps[rows])
+            result[f"bkp_{name}"] = bkps
+            result[f"pre_{name}"] = before
+            result[f"post_{name}"] = after
+        return result
+
+    def batch_run(self, *args, **kwargs) -> None:
+        """先准备好共享的地形图层，再多次运行模型。参数与 `Experiment.batch_run` 相同。"""
+        shared = self.share_landscape()
+        if shared is None:
+            super().batch_run(*args, **kwargs)
+            return
+        cfg, self._cfg = self._cfg, shared
+        try:
+            super().batch_run(*args, **kwargs)
+        finally:
+            self._cfg = cfg
+
     @with_axes(figsize=(6, 4))
     def plot_agg_dynamic(
         self, y: ActorType, job: JobType = "len", ax=None, save=False
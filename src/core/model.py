@@ -9,16 +9,25 @@
 from __future__ import annotations
 
 import re
-from functools import lru_cache
-from typing import TYPE_CHECKING, Dict, Tuple
+import tempfile
+from functools import cached_property, lru_cache, partial, wraps
+from operator import methodcaller
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 from abses import ActorsList, MainModel
+from abses.core.time_driver import TimeDriver
+from mesa import Agent
 from scipy import stats
 
-from src.api import Farmer, Hunter, RiceFarmer
+from src.api import CompetingModule, Farmer, Hunter, RiceFarmer
+from src.api.store import AgentStore
+from src.core.collector import DEFAULT_CAPACITY, ColumnarDataCollector
+from src.core.engine import VectorEngine
 from src.workflow.analysis import detect_breakpoints
+from src.workflow.online import OnlineBreakpoints, SteadyState
 from src.workflow.plot import ModelViz
 
 # 正则表达式
@@ -32,10 +41,23 @@ COL_NAMES = {
     "group_ratio": "len_breed",
 }
 
+# 统计时使用的名称，及其对应的主体类型
+BREEDS = {"farmers": Farmer, "hunters": Hunter, "rice": RiceFarmer}
+
 PATTERN = r"^(farmers|hunters|rice) (group|size) (ratio|num)$"
-BKP = r"^bkp_(farmers|hunters|rice)"
-PRE = r"^pre_(farmers|hunters|rice)"
-POST = r"^post_(farmers|hunters|rice)"
+BKP = r"^bkp_(farmers|hunters|rice)$"
+PRE = r"^pre_(farmers|hunters|rice)$"
+POST = r"^post_(farmers|hunters|rice)$"
+SERIES = r"^series_(farmers|hunters|rice)$"
+ONLINE = r"^online_(bkp|stat)_(farmers|hunters|rice)$"
+
+# 运行中检测断点时，每种检测数据对应的统计表达式
+ONLINE_EXPRESSIONS = {
+    "size": "{} size num",
+    "ratio": "{} size ratio",
+    "group": "{} group num",
+    "group_ratio": "{} group ratio",
+}
 
 
 def clean_name(attribute: str) -> dict:
@@ -56,39 +78,155 @@ def counting(
     ratio: bool = False,
     group: bool = False,
 ) -> int | float:
-    """统计某个主体的数量"""
-    actors: ActorsList = getattr(model, breed)
-    num = len(actors) if group else actors.array("size").sum()
+    """统计某个主体的数量。
+
+    直接读取主体仓库里随主体出生、死亡和人口规模变化而更新的计数，
+    与遍历所有主体统计的结果一致。
+    """
+    census = AgentStore.of(model)
+    store = census[BREEDS[breed]]
+    num = store.count if group else store.total
     if num == 0:
         return 0.0
     if not ratio:
         return num
     if group:
-        return num / len(model.agents)
-    return num / model.actors.array("size").sum()
+        return num / census.count
+    return num / census.total
+
+
+def _rate_reporter(actor: ActorType, index: int) -> Callable[[Model], float]:
+    """断点之前（0）或之后（1）的增长率"""
+
+    def rate(model: Model) -> float:
+        return model.calc_rate(actor)[index]
+
+    return rate
+
+
+def _online_reporter(model: Model, kind: str, actor: ActorType) -> Any:
+    """运行中检测到的断点位置（`bkp`），或者当前的累积量（`stat`）"""
+    if model.online is None:
+        return None
+    detector = model.online[actor]
+    return detector.bkp if kind == "bkp" else detector.statistic
+
+
+# 保存解析结果的表达式个数。能解析的报告只有几十个，其余是按属性名读取时
+# 试探的名称（结果为 `None`），限制个数以免任意的名称让缓存一直增长
+REPORTER_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=REPORTER_CACHE_SIZE)
+def compile_reporter(expression: str) -> Optional[Callable[[Model], Any]]:
+    """把报告的表达式解析成以模型为参数的函数。
+
+    表达式和配置里 `reports` 的写法一样，例如 `"farmers size ratio"`、`"bkp_rice"`。
+    同一个表达式只解析一次，不是报告的表达式返回 `None`，这个结果也会保存。
+    """
+    # 断点识别
+    if match := re.match(BKP, expression):
+        return methodcaller("detect_breakpoints", match.group(1))
+    # 计算断点之前的增长率
+    if match := re.match(PRE, expression):
+        return _rate_reporter(match.group(1), 0)
+    # 计算断点之后的增长率
+    if match := re.match(POST, expression):
+        return _rate_reporter(match.group(1), 1)
+    # 运行中检测到的断点，以及当前的累积量
+    if match := re.match(ONLINE, expression):
+        return partial(_online_reporter, kind=match.group(1), actor=match.group(2))
+    # 检测断点的整列数据，留给实验统一分析
+    if match := re.match(SERIES, expression):
+        actor = match.group(1)
+        return lambda model: model.get_data_col(actor).to_numpy()
+    # 计数
+    if re.match(PATTERN, expression):
+        return partial(counting, **clean_name(expression))
+    return None
+
+
+def analysis_cache(method: Callable[[Model, ActorType], Any]) -> Callable:
+    """按模型保存分析某个主体的结果。
+
+    结果保存在模型自己的字典里，随模型一起释放，不会让结束运行的模型一直留在内存里；
+    收集到新的数据之后重新计算。同一次运行的 `bkp_*`、`pre_*`、`post_*` 报告共用这些结果。
+    """
+    name = method.__name__
+
+    @wraps(method)
+    def cached(self: Model, actor: ActorType) -> Any:
+        cache = self.__dict__.setdefault("_analysis_cache", {})
+        rows = len(self.datacollector)
+        hit = cache.get((name, actor))
+        if hit is not None and hit[0] == rows:
+            return hit[1]
+        result = method(self, actor)
+        cache[(name, actor)] = (rows, result)
+        return result
+
+    return cached
 
 
 class Model(MainModel):
     """运行的模型"""
 
+    # 提前结束运行的时间和原因，运行到 `time.end` 时为空
+    stop_reason: Optional[str] = None
+    _stop_tick: Optional[int] = None
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.datacollector = self._columnar_collector()
+
     def __deepcopy__(self, memo):
         return self
 
+    def _columnar_collector(self) -> ColumnarDataCollector:
+        """按列保存模型变量的数据收集器，每一列的长度按 `time.end` 预先分配。
+
+        配置了 `model.spill_data` 时，每写满 `model.spill_rows` 行，
+        就写入这个文件夹下本次运行的一个分块文件。
+        实验的不同参数组合里重复的编号相同，所以每次运行使用各自新建的子文件夹。
+        """
+        end = self.time.end_at
+        capacity = end if isinstance(end, int) and end > 0 else DEFAULT_CAPACITY
+        spill_to = self.p.get("spill_data", None)
+        if spill_to is not None:
+            Path(spill_to).mkdir(parents=True, exist_ok=True)
+            spill_to = tempfile.mkdtemp(dir=spill_to, prefix=f"repeat_{self.run_id}_")
+            capacity = min(capacity, self.p.get("spill_rows", DEFAULT_CAPACITY))
+        return ColumnarDataCollector(
+            self.settings.get("reports") or {},
+            capacity=capacity,
+            spill_to=spill_to,
+            spill_format=self.p.get("spill_format", "parquet"),
+        )
+
     def __getattr__(self, name: str):
-        # 断点识别
-        if re.match(BKP, name):
-            return self.detect_breakpoints(name.replace("bkp_", ""))
-        # 计算断点之前的增长率
-        if re.match(PRE, name):
-            return self.calc_rate(name.replace("pre_", ""))[0]
-        # 计算断点之后的增长率
-        if re.match(POST, name):
-            return self.calc_rate(name.replace("post_", ""))[1]
-        # 计数
-        if kwargs := clean_name(name):
-            return counting(model=self, **kwargs)
+        # 配置之外的报告名称，按解析过的表达式计算
+        if (reporter := compile_reporter(name)) is not None:
+            return reporter(self)
         return super().__getattribute__(name)
 
+    def setup(self) -> None:
+        """开始运行前，把报告的表达式解析成函数，数据收集器直接调用"""
+        self.compile_reporters()
+
+    def compile_reporters(self) -> None:
+        """用解析后的函数替换数据收集器里按属性名读取的报告"""
+        reports = self.settings.get("reports") or {}
+        collector = self.datacollector
+        for kind, reporters in (
+            ("model", collector.model_reporters),
+            ("final", collector.final_reporters),
+        ):
+            for name, expression in (reports.get(kind) or {}).items():
+                if name not in reporters or not isinstance(expression, str):
+                    continue
+                if (reporter := compile_reporter(expression)) is not None:
+                    reporters[name] = reporter
+
     @property
     def grid(self):
         """数字高程模型"""
@@ -109,7 +247,7 @@ class Model(MainModel):
         """种水稻的农民列表"""
         return self.agents[RiceFarmer]
 
-    @lru_cache
+    @analysis_cache
     def get_data_col(self, actor: ActorType) -> pd.Series:
         """获取主体的数据列"""
         data = self.datacollector.get_model_vars_dataframe()
@@ -117,7 +255,7 @@ class Model(MainModel):
         col = COL_NAMES[col_by].replace("breed", actor)
         return data[col]
 
-    @lru_cache
+    @analysis_cache
     def detect_breakpoints(self, actor: ActorType) -> int:
         """检测某个主体数量发展中的拐点。
         Parameters:
@@ -134,7 +272,7 @@ class Model(MainModel):
         data = self.get_data_col(actor)
         return detect_breakpoints(data, n_bkps=n_bkps)
 
-    @lru_cache
+    @analysis_cache
     def calc_rate(self, actor: ActorType) -> Tuple[float, float]:
         """计算某个主体在断点前后的线性增长率（斜率）。"""
         data = self.get_data_col(actor)
@@ -186,11 +324,93 @@ class Model(MainModel):
             }
         ).to_csv(self.outpath / f"repeat_{self.run_id}_conversion.csv")
 
+    @cached_property
+    def engine(self) -> Optional[VectorEngine]:
+        """按阶段整体运行主体的引擎。
+
+        配置里的 `model.engine` 为 `vector` 时使用，
+        默认为 `agent`，即每个主体依次执行自己的 `step`。
+        """
+        engine = self.p.get("engine", "agent")
+        if engine == "vector":
+            return VectorEngine(self)
+        if engine != "agent":
+            raise ValueError(f"Unknown engine {engine}, use 'agent' or 'vector'.")
+        return None
+
+    @cached_property
+    def online(self) -> Optional[OnlineBreakpoints]:
+        """运行中逐步更新的断点检测，配置 `model.online.enabled` 时使用。
+
+        每一步读取与 `detect_bkp_by` 对应的人口统计，检测增长量的变化，
+        断点的位置与 `detect_breakpoints` 一样是数据的索引。
+        """
+        settings = self.p.get("online") or {}
+        if not settings.get("enabled", False):
+            return None
+        expression = ONLINE_EXPRESSIONS[self.p.get("detect_bkp_by", "size")]
+        readers = {
+            breed: partial(compile_reporter(expression.format(breed)), self)
+            for breed in BREEDS
+        }
+        return OnlineBreakpoints(
+            readers,
+            stop_on=settings.get("stop_on") or (),
+            threshold=settings.get("threshold", 5.0),
+            drift=settings.get("drift", 0.5),
+            warmup=settings.get("warmup", 5),
+            patience=settings.get("patience", 10),
+        )
+
+    @cached_property
+    def steady(self) -> Optional[SteadyState]:
+        """人口构成稳定、或者有主体灭绝时提前结束运行，配置 `model.steady.enabled` 时使用"""
+        settings = self.p.get("steady") or {}
+        if not settings.get("enabled", False):
+            return None
+        readers = {
+            breed: partial(compile_reporter(f"{breed} size ratio"), self)
+            for breed in BREEDS
+        }
+        return SteadyState(
+            readers,
+            window=settings.get("window", 20),
+            tolerance=settings.get("tolerance", 0.01),
+            extinct=settings.get("extinct", True),
+            min_ticks=settings.get("min_ticks", 10),
+        )
+
+    @property
+    def stop_tick(self) -> int:
+        """运行结束的时间。提前结束时是结束的那一步，否则是当前的时间"""
+        if self._stop_tick is None:
+            return self.time.tick
+        return self._stop_tick
+
+    def stop(self, reason: str) -> None:
+        """提前结束运行，记录结束的时间和原因，运行结束后仍然计算最终的报告"""
+        self.running = False
+        self.stop_reason = reason
+        self._stop_tick = self.time.tick
+
     def step(self) -> None:
         """每一步运行后，收集数据"""
+        # 上一步死亡的主体释放的槽位，从这一步开始可以重新使用
+        AgentStore.of(self).recycle()
         self.do_each("step", order=("nature", "human"))
-        self.agents.shuffle_do("step")
+        if self.engine is None:
+            self.agents.shuffle_do("step")
+        else:
+            self.engine.step()
+        if self.online is not None:
+            self.online.update()
         self.datacollector.collect(self)
+        # 人口构成稳定，或者关注的主体都检测到断点并稳定之后，提前结束
+        reason = None if self.steady is None else self.steady.update()
+        if self.online is not None and self.online.should_stop:
+            reason = "online"
+        if reason is not None:
+            self.stop(reason)
 
     def end(self):
         """模型运行结束后，将自动绘制狩猎采集者和农民的数量变化"""
@@ -200,6 +420,22 @@ class Model(MainModel):
         #     attr="size", savefig=self.outpath / f"repeat_{self.run_id}_hist.jpg"
         # )
         self.export_conversion_data()
+        self.release()
+
+    def release(self) -> None:
+        """解除其它对象对结束运行的模型的引用，使它可以被释放。
+
+        主体的编号计数器和时间驱动器都按模型保存在 `mesa` 和 `abses` 的类属性里，
+        主体仓库和图层保存对象的数组也不参与循环垃圾回收，
+        在同一个进程里连续运行很多次时，结束的模型会一直留在内存里。
+        运行结束后调用，之后仍可以计算最终的报告，但不应再创建新的主体。
+        """
+        TimeDriver._instances.pop(self, None)
+        Agent._ids.pop(self, None)
+        AgentStore.of(self).release()
+        for module in self.nature.modules.values():
+            if isinstance(module, CompetingModule):
+                module.release()
 
     @property
     def plot(self) -> ModelViz:
@@ -5,11 +5,157 @@
 # GitHub   : https://github.com/SongshGeo
 # Website: https://cv.songshgeo.com/
 
-from typing import List
+from typing import List, Tuple
 
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 import ruptures as rpt
+from ruptures.exceptions import BadSegmentationParameters
+
+# `ruptures` 的 Dynp 默认只在这个间隔的倍数处切割
+JUMP = 5
+# 前缀和与 `ruptures` 的计算方式舍入误差不同，代价相差在这个比例内的断点重新精确计算
+COST_RTOL = 1e-9
+
+
+def single_breakpoint(values: np.ndarray, min_size: int = 5, jump: int = JUMP) -> int:
+    """用 L2 代价找到一个断点，结果与 `ruptures.Dynp(model="l2")` 相同。
+
+    对每个可以切割的位置，用数值和平方和的前缀和在常数时间里算出两段的代价，
+    整个序列只需要线性的时间。代价几乎相同的位置按 `ruptures` 的方式重新计算，
+    相同时和 `ruptures` 一样取最早的位置。
+
+    Parameters:
+        values:
+            一维的序列数据。
+        min_size:
+            每一段最小的长度。
+        jump:
+            只在这个间隔的倍数处切割。
+
+    Raises:
+        BadSegmentationParameters:
+            序列太短，无法切割成两段。
+
+    Returns:
+        断点的位置，即第二段开始的索引。
+    """
+    n_samples = len(values)
+    min_size = max(min_size, 1)
+    if n_samples // jump < 1 or -(-min_size // jump) * jump + min_size > n_samples:
+        raise BadSegmentationParameters
+    # 可以切割的位置：间隔的倍数，且两段都不短于最小长度
+    first = -(-min_size // jump) * jump
+    bkps = np.arange(first, n_samples - min_size + 1, jump)
+    # 减去均值再累加，减小前缀和的舍入误差
+    centered = values.astype(np.float64) - values.mean()
+    sums = np.concatenate(([0.0], np.cumsum(centered)))
+    squares = np.concatenate(([0.0], np.cumsum(centered**2)))
+    left = squares[bkps] - sums[bkps] ** 2 / bkps
+    right = (squares[-1] - squares[bkps]) - (sums[-1] - sums[bkps]) ** 2 / (
+        n_samples - bkps
+    )
+    costs = left + right
+    candidates = np.flatnonzero(costs <= costs.min() + COST_RTOL * squares[-1])
+    if len(candidates) == 1:
+        return int(bkps[candidates[0]])
+    signal = values.reshape(-1, 1)
+    exact = [
+        signal[:bkp].var(axis=0).sum() * bkp
+        + signal[bkp:].var(axis=0).sum() * (n_samples - bkp)
+        for bkp in bkps[candidates]
+    ]
+    return int(bkps[candidates[np.argmin(exact)]])
+
+
+def batch_breakpoints(
+    data: np.ndarray, min_size: int = 5, jump: int = JUMP
+) -> np.ndarray:
+    """同时找到多次运行的断点，结果与逐行调用 `single_breakpoint` 相同。
+
+    Parameters:
+        data:
+            二维数组，每一行是一次运行的序列，长度相同。
+        min_size:
+            每一段最小的长度。
+        jump:
+            只在这个间隔的倍数处切割。
+
+    Returns:
+        每一行断点的位置。
+    """
+    data = np.asarray(data, dtype=np.float64)
+    n_samples = data.shape[1]
+    min_size = max(min_size, 1)
+    if n_samples // jump < 1 or -(-min_size // jump) * jump + min_size > n_samples:
+        raise BadSegmentationParameters
+    first = -(-min_size // jump) * jump
+    bkps = np.arange(first, n_samples - min_size + 1, jump)
+    centered = data - data.mean(axis=1, keepdims=True)
+    zeros = np.zeros((len(data), 1))
+    sums = np.hstack([zeros, np.cumsum(centered, axis=1)])
+    squares = np.hstack([zeros, np.cumsum(centered**2, axis=1)])
+    left = squares[:, bkps] - sums[:, bkps] ** 2 / bkps
+    right = (squares[:, -1:] - squares[:, bkps]) - (
+        sums[:, -1:] - sums[:, bkps]
+    ) ** 2 / (n_samples - bkps)
+    costs = left + right
+    near = costs <= costs.min(axis=1, keepdims=True) + COST_RTOL * squares[:, -1:]
+    result = bkps[np.argmax(near, axis=1)]
+    # 代价几乎相同的运行，逐个按 `ruptures` 的方式重新计算
+    for row in np.flatnonzero(near.sum(axis=1) > 1):
+        result[row] = single_breakpoint(data[row], min_size=min_size, jump=jump)
+    return result
+
+
+def batch_rates(data: np.ndarray, bkps: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """同时计算多次运行在断点前后的线性增长率（斜率）。
+
+    和 `Model.calc_rate` 一样，断点之前是 `[0, bkp]`，断点之后是 `[bkp, n)`，
+    都包含断点本身，只有一个值的一段增长率为 0。
+    最小二乘的斜率由数值、数值乘以时间的前缀和直接算出。
+
+    Parameters:
+        data:
+            二维数组，每一行是一次运行的序列，长度相同。
+        bkps:
+            每一行断点的位置。
+
+    Returns:
+        断点之前和之后的增长率。
+    """
+    data = np.asarray(data, dtype=np.float64)
+    n_runs, n_samples = data.shape
+    rows = np.arange(n_runs)
+    bkps = np.asarray(bkps)
+    time = np.arange(n_samples, dtype=np.float64)
+    # 斜率与数值的平移无关，减去均值减小舍入误差
+    centered = data - data.mean(axis=1, keepdims=True)
+    zeros = np.zeros((n_runs, 1))
+    sums = np.hstack([zeros, np.cumsum(centered, axis=1)])
+    products = np.hstack([zeros, np.cumsum(centered * time, axis=1)])
+
+    def slope(start: np.ndarray, end: np.ndarray) -> np.ndarray:
+        length = (end - start).astype(np.float64)
+        sum_t = (start + end - 1) * length / 2
+        sum_tt = _sum_squares(end) - _sum_squares(start)
+        sum_y = sums[rows, end] - sums[rows, start]
+        sum_ty = products[rows, end] - products[rows, start]
+        denominator = length * sum_tt - sum_t**2
+        numerator = length * sum_ty - sum_t * sum_y
+        valid = length > 1
+        return np.divide(numerator, denominator, out=np.zeros(n_runs), where=valid)
+
+    before = slope(np.zeros(n_runs, dtype=int), bkps + 1)
+    after = slope(bkps, np.full(n_runs, n_samples))
+    return before, after
+
+
+def _sum_squares(k: np.ndarray) -> np.ndarray:
+    """0 到 k - 1 的平方和"""
+    k = np.asarray(k, dtype=np.float64)
+    return (k - 1) * k * (2 * k - 1) / 6
 
 
 def detect_breakpoints(
@@ -28,7 +174,7 @@ def detect_breakpoints(
             - "[Binseg](https://centre-borelli.github.io/ruptures-docs/code-reference/detection/binseg-reference/)"
             - "[BottomUp](https://centre-borelli.github.io/ruptures-docs/code-reference/detection/bottomup-reference/)"
             - "[Window](https://centre-borelli.github.io/ruptures-docs/code-reference/detection/window-reference/)"
-            默认选用 Dynp。
+            默认选用 Dynp。只找一个断点时，Dynp 用 `single_breakpoint` 在线性时间里计算。
         min_size:
             切割时间序列后，每一段最小不能少于几个时间单位，默认为5。
 
@@ -44,9 +190,14 @@ def detect_breakpoints(
         raise ValueError(
             f"Algorithm should be chosen from {valid_algorithms}, got {algorithm} instead."
         )
+    values = series.values
+    # 一个断点的 Dynp 直接用前缀和计算，不是数值或者有缺失值时仍交给 ruptures
+    numeric = values.dtype.kind in "biuf" and np.isfinite(values).all()
+    if algorithm == "Dynp" and n_bkps == 1 and numeric:
+        return series.index[single_breakpoint(values, min_size=min_size)]
     algorithm = getattr(rpt, algorithm, None)
     algo = algorithm(model="l2", min_size=min_size)
-    algo.fit(series.values)
+    algo.fit(values)
     result = algo.predict(n_bkps=n_bkps)
     breakpoints = [series.index[i] for i in result[:-1]]
     if n_bkps == 1:
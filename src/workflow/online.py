@@ -0,0 +1,211 @@
+#!/usr/bin/env python 3.11.0
+# -*-coding:utf-8 -*-
+# @Author  : Shuang (Twist) Song
+# @Contact   : SongshGeo@gmail.com
+# GitHub   : https://github.com/SongshGeo
+# Website: https://cv.songshgeo.com/
+
+"""运行中逐步更新的断点检测，以及人口构成是否已经稳定。
+
+`detect_breakpoints` 在运行结束后用完整的序列寻找断点。
+这里在每一步读取一次人口统计的结果，用双侧 CUSUM 检测每一步增长量的变化，
+每次更新只需要常数时间，运行时就可以知道增长的趋势是否已经改变、是否已经稳定。
+`SteadyState` 则观察最近一段时间各主体人口比例的变化，用于提前结束运行。
+"""
+
+from __future__ import annotations
+
+from math import sqrt
+from typing import Callable, Dict, Iterable, Optional
+
+import numpy as np
+
+# 增长量的标准差为 0 时（例如一直没有人口），用这个值代替
+MIN_SCALE = 1e-9
+
+
+class Cusum:
+    """检测序列增长量变化的双侧 CUSUM。
+
+    先用开始的 `warmup` 个增长量估计均值和标准差，
+    之后每一步累积标准化的偏差，超过 `threshold` 时认为增长的趋势发生了变化，
+    变化的位置是累积量最后一次为 0 的位置。之后重新估计新的增长量。
+
+    Parameters:
+        threshold:
+            累积的标准化偏差超过这个值时认为发生了变化。
+        drift:
+            每一步允许的标准化偏差，越大越不敏感。
+        warmup:
+            估计增长量的均值和标准差所用的步数。
+        patience:
+            检测到变化后，连续这么多步没有新的变化，认为已经稳定。
+    """
+
+    def __init__(
+        self,
+        threshold: float = 5.0,
+        drift: float = 0.5,
+        warmup: int = 5,
+        patience: int = 10,
+    ) -> None:
+        self.threshold = threshold
+        self.drift = drift
+        self.warmup = max(int(warmup), 1)
+        self.patience = patience
+        self.index = -1
+        self.bkp: Optional[int] = None
+        self.alarms = 0
+        self._alarm_at: Optional[int] = None
+        self._last: Optional[float] = None
+        self._restart()
+
+    def _restart(self) -> None:
+        """重新估计增长量的均值和标准差"""
+        self._count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self.high = 0.0
+        self.low = 0.0
+        self._high_zero = self._low_zero = self.index
+
+    @property
+    def statistic(self) -> float:
+        """当前两侧累积量中较大的一个"""
+        return max(self.high, self.low)
+
+    @property
+    def stable(self) -> bool:
+        """是否已经检测到变化，并且之后的 `patience` 步都没有新的变化"""
+        if self._alarm_at is None:
+            return False
+        return self.index - self._alarm_at >= self.patience
+
+    def update(self, value: float) -> bool:
+        """读入序列的下一个值，返回这一步是否检测到了变化"""
+        self.index += 1
+        last, self._last = self._last, value
+        if last is None:
+            self._high_zero = self._low_zero = self.index
+            return False
+        diff = value - last
+        if self._count < self.warmup:
+            self._count += 1
+            delta = diff - self._mean
+            self._mean += delta / self._count
+            self._m2 += delta * (diff - self._mean)
+            self._high_zero = self._low_zero = self.index
+            return False
+        scale = max(sqrt(self._m2 / self._count), MIN_SCALE)
+        score = (diff - self._mean) / scale
+        self.high = max(0.0, self.high + score - self.drift)
+        self.low = max(0.0, self.low - score - self.drift)
+        if self.high == 0.0:
+            self._high_zero = self.index
+        if self.low == 0.0:
+            self._low_zero = self.index
+        if self.statistic <= self.threshold:
+            return False
+        self.bkp = self._high_zero if self.high > self.threshold else self._low_zero
+        self.alarms += 1
+        self._alarm_at = self.index
+        self._restart()
+        return True
+
+
+class OnlineBreakpoints:
+    """每个主体一个 `Cusum`，每一步读取一次人口统计。
+
+    Parameters:
+        readers:
+            主体的名称，以及读取它这一步统计结果的函数。
+        stop_on:
+            这些主体都检测到变化并稳定之后，`should_stop` 为真。
+        **kwargs:
+            `Cusum` 的参数。
+    """
+
+    def __init__(
+        self,
+        readers: Dict[str, Callable[[], float]],
+        stop_on: Iterable[str] = (),
+        **kwargs,
+    ) -> None:
+        self.readers = readers
+        self.stop_on = tuple(stop_on)
+        unknown = set(self.stop_on) - set(readers)
+        if unknown:
+            raise ValueError(f"Unknown breeds {unknown} to stop on.")
+        self.detectors = {breed: Cusum(**kwargs) for breed in readers}
+
+    def __getitem__(self, breed: str) -> Cusum:
+        return self.detectors[breed]
+
+    def update(self) -> None:
+        """读取所有主体这一步的统计结果"""
+        for breed, read in self.readers.items():
+            self.detectors[breed].update(read())
+
+    @property
+    def should_stop(self) -> bool:
+        """需要关注的主体是否都已经检测到变化并稳定"""
+        if not self.stop_on:
+            return False
+        return all(self.detectors[breed].stable for breed in self.stop_on)
+
+
+class SteadyState:
+    """观察最近一段时间各主体的人口比例，判断人口构成是否已经稳定。
+
+    窗口内每个主体比例的变化幅度（最大值减最小值）相对于平均值都不超过 `tolerance` 时，
+    认为已经稳定；曾经存在的主体人口变为 0 时，认为已经灭绝。
+
+    Parameters:
+        readers:
+            主体的名称，以及读取它这一步人口比例的函数。
+        window:
+            比较最近多少步的人口比例。
+        tolerance:
+            相对变化的容许值。
+        extinct:
+            主体灭绝时是否也结束。
+        min_ticks:
+            至少运行多少步之后才判断，保证运行结束后仍可以检测断点。
+    """
+
+    def __init__(
+        self,
+        readers: Dict[str, Callable[[], float]],
+        window: int = 20,
+        tolerance: float = 0.01,
+        extinct: bool = True,
+        min_ticks: int = 10,
+    ) -> None:
+        self.readers = readers
+        self.window = max(int(window), 1)
+        self.tolerance = tolerance
+        self.extinct = extinct
+        self.min_ticks = min_ticks
+        self.ticks = 0
+        self._history = np.zeros((self.window, len(readers)))
+        self._seen = np.zeros(len(readers), dtype=bool)
+
+    def update(self) -> Optional[str]:
+        """读取这一步的人口比例，需要结束时返回原因：`extinct` 或者 `steady`"""
+        values = np.array([read() for read in self.readers.values()], dtype=float)
+        self._history[self.ticks % self.window] = values
+        self.ticks += 1
+        gone = self._seen & (values == 0)
+        self._seen |= values > 0
+        if self.ticks < max(self.min_ticks, 1):
+            return None
+        if self.extinct and gone.any():
+            return "extinct"
+        if self.ticks < self.window:
+            return None
+        history = self._history
+        spread = history.max(axis=0) - history.min(axis=0)
+        scale = np.maximum(history.mean(axis=0), MIN_SCALE)
+        if (spread / scale <= self.tolerance).all():
+            return "steady"
+        return None
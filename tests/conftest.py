@@ -5,8 +5,7 @@
 # GitHub   : https://github.com/SongshGeo
 # Website: https://cv.songshgeo.com/
 
-"""用于测试的基本模型，和图层。
-"""
+"""用于测试的基本模型，和图层。"""
 
 import os
 
@@ -15,7 +14,7 @@ import pytest
 from abses import MainModel, PatchModule
 from hydra import compose, initialize
 
-from src.api.env import CompetingCell
+from src.api.env import CompetingCell, CompetingModule
 from src.core import Model
 
 # 加载项目层面的配置
@@ -32,8 +31,12 @@ def mock_model_layer():
         name="layer",
         shape=(4, 4),
         cell_cls=CompetingCell,
+        module_cls=CompetingModule,
     )
     layer.apply_raster(np.ones((1, 4, 4)) * cfg.SiteGroup.max_size, "lim_h")
+    # 默认是陆地，但不是可耕地
+    layer.apply_raster(np.full((1, 4, 4), 100.0), "elevation")
+    layer.apply_raster(np.full((1, 4, 4), 20.0), "slope")
     return model, layer
 
 
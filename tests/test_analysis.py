@@ -0,0 +1,108 @@
+#!/usr/bin/env python 3.11.0
+# -*-coding:utf-8 -*-
+# @Author  : Shuang (Twist) Song
+# @Contact   : SongshGeo@gmail.com
+# GitHub   : https://github.com/SongshGeo
+# Website: https://cv.songshgeo.com/
+
+"""测试断点检测"""
+
+import numpy as np
+import pandas as pd
+import pytest
+import ruptures as rpt
+from ruptures.exceptions import BadSegmentationParameters
+from scipy import stats
+
+from src.core import MyExperiment
+from src.workflow.analysis import (
+    batch_breakpoints,
+    batch_rates,
+    detect_breakpoints,
+    single_breakpoint,
+)
+
+
+def dynp(values, min_size):
+    """用 ruptures 检测一个断点"""
+    algo = rpt.Dynp(model="l2", min_size=min_size)
+    algo.fit(values)
+    return algo.predict(n_bkps=1)[0]
+
+
+@pytest.mark.parametrize("min_size", [1, 3, 5, 7, 11])
+def test_same_as_dynp(min_size):
+    """测试前缀和找到的断点和 ruptures 的相同，包括代价相同的情况"""
+    rng = np.random.default_rng(min_size)
+    series = [
+        rng.normal(size=80).cumsum(),
+        rng.integers(0, 3, size=63),
+        np.full(50, 0.1),
+        np.zeros(40, dtype=int),
+        np.r_[np.zeros(30), np.arange(34) * 1e6],
+    ]
+    for values in series:
+        assert single_breakpoint(values, min_size=min_size) == dynp(values, min_size)
+
+
+def test_too_short():
+    """测试序列太短时和 ruptures 一样无法切割"""
+    with pytest.raises(BadSegmentationParameters):
+        single_breakpoint(np.arange(9), min_size=5)
+    assert single_breakpoint(np.arange(10), min_size=5) == 5
+
+
+def test_detect_breakpoints():
+    """测试断点对应序列的索引，其它算法仍使用 ruptures"""
+    # arrange
+    values = np.r_[np.ones(20), np.full(20, 5.0)]
+    series = pd.Series(values, index=np.arange(20, 60))
+
+    # act / assert
+    assert detect_breakpoints(series) == 40
+    assert detect_breakpoints(series, algorithm="Binseg") == 40
+    with pytest.raises(ValueError):
+        detect_breakpoints(series, algorithm="Pelt")
+
+
+def test_batch_breakpoints():
+    """测试同时分析多次运行，结果与逐次分析相同"""
+    # arrange
+    rng = np.random.default_rng(0)
+    data = np.vstack([rng.normal(size=(6, 48)).cumsum(axis=1), np.zeros((2, 48))])
+
+    # act
+    bkps = batch_breakpoints(data)
+    before, after = batch_rates(data, bkps)
+
+    # assert
+    for row, bkp in enumerate(bkps):
+        assert bkp == single_breakpoint(data[row])
+        x = np.arange(48)
+        expected = stats.linregress(x[: bkp + 1], data[row, : bkp + 1]).slope
+        assert before[row] == pytest.approx(expected)
+        expected = stats.linregress(x[bkp:], data[row, bkp:]).slope
+        assert after[row] == pytest.approx(expected)
+
+
+def test_analyze_breakpoints():
+    """测试实验总结里的整列数据按长度分组分析，结果写入同名的列"""
+    # arrange
+    step = np.r_[np.ones(10), np.full(10, 5.0)]
+    short = np.r_[np.ones(10), np.full(5, 2.0)]
+    summary = pd.DataFrame(
+        {"job_id": [0, 0, 1], "series_farmers": [step, step * 3, short]}
+    )
+
+    # act
+    result = MyExperiment.analyze_breakpoints(summary)
+
+    # assert
+    assert "series_farmers" not in result and "bkp_rice" not in result
+    assert result["bkp_farmer"].tolist() == [10, 10, 10]
+    slopes = [stats.linregress(np.arange(11), s[:11]).slope for s in (step, short)]
+    assert result["pre_farmer"].tolist() == pytest.approx(
+        [slopes[0], slopes[0] * 3, slopes[1]]
+    )
+    assert result["post_farmer"].tolist() == pytest.approx([0.0, 0.0, 0.0])
+    assert "series_farmers" in summary
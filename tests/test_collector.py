@@ -0,0 +1,130 @@
+#!/usr/bin/env python 3.11.0
+# -*-coding:utf-8 -*-
+# @Author  : Shuang (Twist) Song
+# @Contact   : SongshGeo@gmail.com
+# GitHub   : https://github.com/SongshGeo
+# Website: https://cv.songshgeo.com/
+
+"""测试按列保存模型变量的数据收集器"""
+
+import importlib.util
+
+import numpy as np
+import pandas as pd
+import pytest
+from abses.utils.datacollector import ABSESpyDataCollector
+from omegaconf import OmegaConf
+
+from src.core import Model
+from src.core.collector import ColumnarDataCollector
+
+from .conftest import cfg
+
+
+class Counter:
+    """每次收集之前增加的计数"""
+
+    def __init__(self):
+        self.tick = 0
+
+    def collect(self, *collectors):
+        self.tick += 1
+        for collector in collectors:
+            collector.collect(self)
+
+
+REPORTS = {
+    "model": {
+        "tick": "tick",
+        "half": lambda obj: obj.tick / 2,
+        "ratio": lambda obj: 0.0 if obj.tick == 2 else obj.tick,
+        "label": lambda obj: f"tick {obj.tick}",
+    }
+}
+
+
+def test_same_as_lists():
+    """测试数组写满后扩大，得到的表格与按列表收集的一致"""
+    # arrange
+    columnar = ColumnarDataCollector(REPORTS, capacity=2)
+    lists = ABSESpyDataCollector(REPORTS)
+    counter = Counter()
+
+    # act
+    for _ in range(5):
+        counter.collect(columnar, lists)
+
+    # assert
+    data = columnar.get_model_vars_dataframe()
+    pd.testing.assert_frame_equal(data, lists.get_model_vars_dataframe())
+    assert data["tick"].dtype == np.int64 and data["ratio"].dtype == np.float64
+    assert len(columnar) == 5 and columnar.capacity == 8
+
+
+def test_lazy_frame():
+    """测试表格只构造一次，再次收集后重新构造"""
+    # arrange
+    collector = ColumnarDataCollector(REPORTS, capacity=4)
+    counter = Counter()
+    counter.collect(collector)
+
+    # act
+    data = collector.get_model_vars_dataframe()
+
+    # assert
+    assert collector.get_model_vars_dataframe() is data
+    counter.collect(collector)
+    assert collector.get_model_vars_dataframe()["tick"].tolist() == [1, 2]
+
+
+def test_spill(tmp_path):
+    """测试写满的数组分块写入文件，读取时合并"""
+    pytest.importorskip("pyarrow")
+    # arrange
+    collector = ColumnarDataCollector(REPORTS, capacity=2, spill_to=tmp_path)
+    counter = Counter()
+
+    # act
+    for _ in range(5):
+        counter.collect(collector)
+
+    # assert
+    assert len(list(tmp_path.iterdir())) == 2 and collector.capacity == 2
+    data = collector.get_model_vars_dataframe()
+    assert data["tick"].tolist() == [1, 2, 3, 4, 5]
+    assert data.index.tolist() == [0, 1, 2, 3, 4]
+
+
+def test_model_collector(model):
+    """测试模型使用按 `time.end` 分配的收集器"""
+    collector = model.datacollector
+    assert isinstance(collector, ColumnarDataCollector)
+    assert collector.capacity == model.time.end_at
+    with pytest.raises(ValueError):
+        ColumnarDataCollector({}, spill_format="csv")
+
+
+def test_spill_same_repeat(tmp_path, monkeypatch):
+    """测试不同参数组合里编号相同的两次运行，分块文件互不干扰"""
+    # arrange：没有安装 pyarrow 时，用 pickle 代替分块文件的读写
+    if importlib.util.find_spec("pyarrow") is None:
+        monkeypatch.setattr(pd.DataFrame, "to_parquet", pd.DataFrame.to_pickle)
+        monkeypatch.setattr(pd, "read_parquet", pd.read_pickle)
+    config = OmegaConf.merge(
+        cfg, {"model": {"spill_data": str(tmp_path), "spill_rows": 2}}
+    )
+    models = [Model(parameters=config, run_id=1) for _ in range(2)]
+
+    # act
+    for job, model in enumerate(models):
+        collector = model.datacollector
+        collector._new_model_reporter("job", lambda _, job=job: job)
+        for _ in range(5):
+            collector.collect(model)
+
+    # assert
+    assert len(list(tmp_path.iterdir())) == 2
+    for job, model in enumerate(models):
+        assert (
+            model.datacollector.get_model_vars_dataframe()["job"].tolist() == [job] * 5
+        )
@@ -0,0 +1,170 @@
+#!/usr/bin/env python 3.11.0
+# -*-coding:utf-8 -*-
+# @Author  : Shuang (Twist) Song
+# @Contact   : SongshGeo@gmail.com
+# GitHub   : https://github.com/SongshGeo
+
+"""测试按阶段整体运行主体的引擎"""
+
+import pytest
+
+from src.api import Farmer, Hunter, RiceFarmer
+from src.core.engine import VectorEngine
+
+from .conftest import set_cell_arable_condition
+
+
+@pytest.fixture(name="engine")
+def mock_engine(model, layer) -> VectorEngine:
+    """图层作为主图层的引擎"""
+    model.nature.major_layer = layer
+    return VectorEngine(model)
+
+
+@pytest.mark.parametrize(
+    "breed, size",
+    [(Hunter, 50), (Hunter, 5.0), (Hunter, 99.99), (Farmer, 100), (Farmer, 3141.9)],
+    ids=["hunter", "hunter_dies", "hunter_max", "farmer", "farmer_complicate"],
+)
+def test_growth(model, layer, engine, breed, size):
+    """测试整体计算的人口增长与逐个主体的结果一致"""
+    # arrange
+    agents = []
+    for cell in (layer.array_cells[0, 0], layer.array_cells[3, 3]):
+        agent = model.agents.new(breed, singleton=True, size=50)
+        agent.move.to(cell)
+        agent._size = size
+        agents.append(agent)
+    one, other = agents
+    slots = engine.store[breed].slots()
+
+    # act
+    one.population_growth()
+    engine.growth(breed, slots[1:])
+
+    # assert
+    assert one.alive == other.alive
+    for attr in ("size", "max_size", "growth_rate", "area"):
+        assert getattr(one, attr, None) == getattr(other, attr, None)
+    assert layer.population["hunters"].sum() == (
+        2 * one.size if breed is Hunter and one.alive else 0
+    )
+
+
+def test_step(model, layer, engine):
+    """测试运行一步之后，主体仓库与主体、图层保持一致"""
+    # arrange
+    for cell in layer.array_cells.flat[::3]:
+        cell.agents.new(Hunter, size=50)
+
+    # act
+    engine.step()
+
+    # assert
+    store = engine.store[Hunter]
+    hunters = model.agents[Hunter]
+    assert len(store) == len(hunters) > 0
+    for hunter in hunters:
+        row, col = hunter.at.indices
+        assert store.cell[hunter._slot] == row * layer.width + col
+        assert layer.population["hunters"][row, col] == hunter.size
+
+
+def test_loss(model, layer, engine):
+    """测试抽中的主体一起损失人口，低于下限的死亡"""
+    # arrange
+    model.settings.Hunter.loss.prob = 1.0
+    big = layer.array_cells[0, 0].agents.new(Hunter, size=50)
+    small = layer.array_cells[1, 1].agents.new(Hunter, size=6)
+
+    # act
+    engine.loss(Hunter, engine.store[Hunter].slots())
+
+    # assert
+    assert big.size == 45 and layer.population["hunters"][0, 0] == 45
+    assert not small.alive and layer.occupancy[1, 1] == -1
+
+
+def test_convert_rice_farmers(model, layer, engine):
+    """测试水稻农民人数不足时一起转化成普通农民"""
+    # arrange
+    for cell in layer.array_cells[0]:
+        cell.agents.new(RiceFarmer, size=100)
+    cohort = engine.cohort()
+
+    # act
+    engine.convert(cohort)
+
+    # assert
+    assert len(model.agents[RiceFarmer]) == 0
+    farmers = model.agents[Farmer]
+    assert len(farmers) == 4
+    assert all(farmer.source == "RiceFarmer" for farmer in farmers)
+
+
+def test_convert_hunters(model, layer, engine):
+    """测试只有周围有农民、且在可耕地上的狩猎采集者转化成农民"""
+    # arrange
+    model.settings.Hunter.convert_prob.to_farmer = 1.0
+    model.settings.Hunter.convert_prob.to_rice = 0.0
+    model.settings.Farmer.convert_prob.to_hunter = 0.0
+    layer.array_cells[0, 0].agents.new(Farmer)
+    for cell in (layer.array_cells[0, 1], layer.array_cells[3, 3]):
+        set_cell_arable_condition(cell, arable=True, rice_arable=False)
+    near = layer.array_cells[0, 1].agents.new(Hunter, size=50)
+    far = layer.array_cells[3, 3].agents.new(Hunter, size=50)
+    unarable = layer.array_cells[1, 0].agents.new(Hunter, size=50)
+
+    # act
+    engine.convert(engine.cohort())
+
+    # assert
+    assert not near.alive and far.alive and unarable.alive
+    (converted,) = layer.array_cells[0, 1].agents
+    assert isinstance(converted, Farmer) and converted.source == "Hunter"
+
+
+def test_diffuse(model, layer, engine):
+    """测试一起分散的新小队选中同一个斑块时，只有一个能得到它"""
+    # arrange
+    full = [layer.array_cells[0, 0], layer.array_cells[0, 2]]
+    parents = [cell.agents.new(Hunter, size=100) for cell in full]
+    for cell in layer.array_cells.flat:
+        if not cell.agents.has() and cell is not layer.array_cells[0, 1]:
+            cell.agents.new(Hunter, size=50)
+
+    # act
+    engine.diffuse(engine.cohort())
+
+    # assert
+    (new,) = layer.array_cells[0, 1].agents
+    assert len(model.agents[Hunter]) == 16 and (layer.occupancy >= 0).all()
+    assert 6 <= new.size <= 31
+    assert all(parent.size < 100 for parent in parents)
+    assert any(parent.size + new.size == 100 for parent in parents)
+    assert layer.population["hunters"][0, 1] == new.size
+
+
+def test_move(model, layer, engine):
+    """测试没有定居的狩猎采集者一起移动到空的斑块，定居的不移动"""
+    # arrange
+    model.settings.Hunter.max_size = 200
+    mobile = [cell.agents.new(Hunter, size=50) for cell in layer.array_cells[1]]
+    settled = layer.array_cells[3, 3].agents.new(Hunter, size=101)
+    origins = [hunter.at for hunter in mobile]
+    assert settled.size == 101
+
+    # act
+    engine.move(engine.cohort()[Hunter])
+
+    # assert
+    assert settled.at is layer.array_cells[3, 3]
+    cells = [hunter.at for hunter in mobile]
+    assert len(set(cells)) == 4 and not set(cells) & set(origins)
+    store = engine.store[Hunter]
+    for hunter in mobile:
+        row, col = hunter.at.indices
+        assert store.cell[hunter._slot] == row * layer.width + col
+        assert layer.occupancy[row, col] == hunter.unique_id
+        assert layer.population["hunters"][row, col] == 50
+    assert (layer.occupancy >= 0).sum() == 5
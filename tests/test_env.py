@@ -7,11 +7,19 @@
 
 import os
 
+import numpy as np
 import pytest
 from abses import MainModel
 from hydra import compose, initialize
 
-from src.api.env import BaseNature, CompetingCell, Env, Farmer, Hunter
+from src.api.env import (
+    BaseNature,
+    CompetingCell,
+    CompetingModule,
+    Env,
+    Farmer,
+    Hunter,
+)
 
 # 加载项目层面的配置
 with initialize(version_base=None, config_path="../config"):
@@ -29,7 +37,11 @@ class TestCompetingCell:
         farmer = model.agents.new(Farmer, singleton=True)
         hunter = model.agents.new(Hunter, singleton=True)
         module = model.nature.create_module(
-            shape=(4, 4), resolution=1, cell_cls=CompetingCell, name="test"
+            shape=(4, 4),
+            resolution=1,
+            cell_cls=CompetingCell,
+            module_cls=CompetingModule,
+            name="test",
         )
         return model, module, farmer, hunter
 
@@ -86,6 +98,130 @@ class TestCompetingCell:
         # assert
         assert cell.is_arable == expected
 
+    def test_suitability_cached(self, cell):
+        """测试适宜性图层只在地形改变时重新计算"""
+        # arrange
+        layer = cell.layer
+        cell.slope, cell.elevation, cell.is_water = 5, 100, False
+        cached = layer.suitability
+
+        # act / assert
+        cell.slope = 5
+        assert layer.suitability is cached
+        cell.slope = 15
+        assert layer.suitability is not cached
+        assert not layer.get_raster("is_arable")[0][cell.indices]
+
+    def test_terrain_arrays(self, cell):
+        """测试地形属性保存在图层的数组里"""
+        # arrange
+        layer = cell.layer
+        elevation = np.arange(16, dtype=float).reshape((1, 4, 4))
+
+        # act
+        cell.slope = 5
+        layer.apply_raster(elevation, attr_name="elevation")
+
+        # assert
+        assert layer.terrain["slope"].dtype == np.float32
+        assert layer.terrain["slope"][cell.indices] == 5
+        assert cell.elevation == 15
+        assert layer.array_cells[0][0].is_water
+        assert not cell.is_water
+        assert layer.get_raster("elevation").sum() == elevation.sum()
+
+    def test_occupancy(self, cell, farmer, the_model):
+        """测试占据数组随主体移动、转化、死亡而更新"""
+        # arrange
+        layer = cell.layer
+        other = layer.array_cells[0][0]
+
+        # act / assert
+        farmer.move.to(cell)
+        assert layer.occupancy[cell.indices] == farmer.unique_id
+        assert cell not in layer.free_cells()
+        farmer.move.to(other)
+        assert layer.occupancy[cell.indices] == -1
+        assert layer.occupancy[other.indices] == farmer.unique_id
+        hunter = other.convert(farmer, "Hunter")
+        assert layer.occupancy[other.indices] == hunter.unique_id
+        hunter.die()
+        assert (layer.occupancy == -1).all()
+        assert len(layer.free_cells()) == 16
+        assert len(the_model.agents) == 1
+
+    def test_population_layers(self, cell, farmer):
+        """测试人口图层随主体的人口规模、位置、转化和死亡而更新"""
+        # arrange
+        layer = cell.layer
+        other = layer.array_cells[0][0]
+        farmer.move.to(cell)
+
+        # act / assert
+        farmer.size = 30
+        assert cell.farmers == 30
+        assert layer.get_xarray("farmers").sum() == 30
+        farmer.move.to(other)
+        assert cell.farmers == 0 and other.farmers == 30
+        hunter = other.convert(farmer, "Hunter")
+        assert other.farmers == 0 and other.hunters == 30
+        hunter.die()
+        assert layer.get_raster("hunters").sum() == 0
+
+    def test_relocate(self, cell, farmer, hunter):
+        """测试整体搬动主体与逐个移动的结果一致"""
+        # arrange
+        layer = cell.layer
+        farmer.move.to(cell)
+        hunter.move.to(layer.array_cells[0, 0])
+        hunter.size = 20
+
+        # act
+        layer.relocate([farmer, hunter], [1, 14])
+
+        # assert
+        assert farmer.at is layer.array_cells[0, 1] and farmer in farmer.at.agents
+        assert hunter.at is layer.array_cells[3, 2] and hunter.on_earth
+        assert not cell.agents.has() and not layer.array_cells[0, 0].agents.has()
+        assert layer.occupancy[0, 1] == farmer.unique_id
+        assert layer.occupancy[3, 2] == hunter.unique_id
+        assert (layer.occupancy >= 0).sum() == 2
+        assert (
+            layer.array_cells[3, 2].hunters == 20
+            and layer.presence["hunters"].sum() == 1
+        )
+        assert layer.population["farmers"][0, 1] == farmer.size
+        assert layer.population["farmers"][3, 3] == 0
+
+    def test_lazy_cells(self, the_model, farmer):
+        """测试斑块只在被用到时才创建，并且与直接创建的斑块一致"""
+        # arrange
+        eager = the_model.nature.array_cells
+        lazy = the_model.nature.create_module(
+            shape=(4, 4),
+            resolution=1,
+            cell_cls=CompetingCell,
+            module_cls=CompetingModule,
+            name="lazy",
+            lazy_cells=True,
+        )
+        assert not lazy._created.any()
+
+        # act
+        cell = lazy.cell_at(7)
+        farmer.move.to(cell)
+        free = lazy.random_cells(3, lazy.occupancy < 0)
+
+        # assert
+        assert lazy._created.sum() == 4
+        assert cell.indices == (1, 3) and lazy.cell_at(7) is cell
+        assert lazy.occupancy[cell.indices] == farmer.unique_id
+        assert cell not in free
+        assert lazy.array_cells[1, 3] is cell and lazy._created.all()
+        for lazy_cell, eager_cell in zip(lazy.array_cells.flat, eager.flat):
+            assert lazy_cell.pos == eager_cell.pos
+            assert lazy_cell.indices == eager_cell.indices
+
     def test_able_to_live_hunter(self, cell, hunter):
         """
         ID: TC006
@@ -183,6 +319,7 @@ class TestEnvironmentSettings:
                     shape=(1, 2),
                     resolution=1,
                     cell_cls=CompetingCell,
+                    module_cls=CompetingModule,
                     major_layer=True,
                 )
                 self.setup_is_water("right")
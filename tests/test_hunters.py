@@ -11,7 +11,14 @@ import numpy as np
 import pytest
 from abses import MainModel, PatchModule
 
-from src.api import CompetingCell, Farmer, Hunter, RiceFarmer, SiteGroup
+from src.api import (
+    CompetingCell,
+    CompetingModule,
+    Farmer,
+    Hunter,
+    RiceFarmer,
+    SiteGroup,
+)
 
 from .conftest import cfg, set_cell_arable_condition
 
@@ -35,7 +42,11 @@ class TestHunters:
     def mock_other_group(self, model: MainModel):
         """一个虚假的聚落"""
         module = model.nature.create_module(
-            shape=(4, 4), resolution=1, cell_cls=CompetingCell, name="test"
+            shape=(4, 4),
+            resolution=1,
+            cell_cls=CompetingCell,
+            module_cls=CompetingModule,
+            name="test",
         )
         cell = module.array_cells[2][3]
         cell.lim_h = 35
@@ -50,6 +61,15 @@ class TestHunters:
         # max_size 现在是配置中的固定值 100，而不是从 lim_h 计算
         assert hunter.max_size == cfg.Hunter.max_size == 100
 
+    def test_max_size_near_water(self, hunter: Hunter, layer):
+        """测试临近水体时人口上限更高，对角线上的水体也算"""
+        # arrange / act
+        layer.array_cells[2][3].is_water = True
+
+        # assert
+        assert hunter.is_near_water()
+        assert hunter.max_size == cfg.Hunter.max_size_water
+
     @pytest.mark.parametrize(
         "size, expected, settled",
         [
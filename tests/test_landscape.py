@@ -0,0 +1,215 @@
+#!/usr/bin/env python 3.11.0
+# -*-coding:utf-8 -*-
+# @Author  : Shuang (Twist) Song
+# @Contact   : SongshGeo@gmail.com
+# GitHub   : https://github.com/SongshGeo
+# Website: https://cv.songshgeo.com/
+
+"""测试整体计算的地形图层"""
+
+import numpy as np
+import pytest
+from abses.utils.func import get_buffer
+
+from src.api.landscape import (
+    NeighbourhoodIndex,
+    near_water,
+    pick_in_groups,
+    smoothed_noise,
+    suitability_layers,
+    toy_landscape,
+    within_radius,
+)
+
+
+class TestSuitability:
+    """测试适宜性图层"""
+
+    @pytest.mark.parametrize(
+        "slope, elevation, is_water, arable, rice",
+        [
+            (5, 100, False, True, False),
+            (15, 100, False, False, False),
+            (5, 400, False, False, False),
+            (5, 100, True, False, False),
+            (0.5, 1, False, True, True),
+            (0.1, 0, False, False, False),
+            (np.nan, 100, False, False, False),
+            (0.1, np.nan, False, False, False),
+        ],
+    )
+    def test_arable(self, slope, elevation, is_water, arable, rice):
+        """测试可耕地和水稻可耕地的判断"""
+        # act
+        layers = suitability_layers(
+            elevation=np.array([elevation]),
+            slope=np.array([slope]),
+            is_water=np.array([is_water]),
+        )
+
+        # assert
+        assert layers["is_arable"][0] == arable
+        assert layers["is_rice_arable"][0] == rice
+        assert layers["is_only_arable"][0] == (arable and not rice)
+
+    @pytest.mark.parametrize(
+        "elevation, expected",
+        [(0, 2), (99.9, 2), (100, 1), (199, 1), (200, 0), (np.nan, 0)],
+    )
+    def test_dem_suitable(self, elevation, expected):
+        """测试海拔适宜度分级"""
+        layers = suitability_layers(
+            elevation=np.array([elevation]),
+            slope=np.array([0.0]),
+            is_water=np.array([False]),
+        )
+        assert layers["dem_suitable"][0] == expected
+
+    @pytest.mark.parametrize(
+        "slope, expected",
+        [(0, 5), (2, 4), (5.9, 3), (6, 2), (9.9, 1), (10, 0), (np.nan, 0)],
+    )
+    def test_slope_suitable(self, slope, expected):
+        """测试坡度适宜度分级"""
+        layers = suitability_layers(
+            elevation=np.array([50.0]),
+            slope=np.array([slope]),
+            is_water=np.array([False]),
+        )
+        assert layers["slope_suitable"][0] == expected
+
+
+def test_near_water():
+    """测试临近水体：周围8个格子里有水体，不包括自身"""
+    is_water = np.zeros((4, 4), dtype=bool)
+    is_water[0, 0] = True
+
+    result = near_water(is_water)
+
+    expected = np.zeros((4, 4), dtype=bool)
+    expected[:2, :2] = True
+    expected[0, 0] = False
+    np.testing.assert_array_equal(result, expected)
+
+
+class TestNeighbourhood:
+    """测试预先计算的邻域索引"""
+
+    @pytest.mark.parametrize("moore", [True, False])
+    @pytest.mark.parametrize("radius", [1, 2, 3])
+    @pytest.mark.parametrize("annular", [True, False])
+    def test_same_as_buffer(self, radius, moore, annular):
+        """测试邻居与按缓冲区计算的结果一致，包括网格边缘"""
+        # arrange
+        shape = (5, 6)
+        index = NeighbourhoodIndex(shape)
+
+        for flat in range(shape[0] * shape[1]):
+            mask = np.zeros(shape, dtype=bool)
+            mask[np.unravel_index(flat, shape)] = True
+            expected = get_buffer(mask, radius=radius, moor=moore, annular=annular)
+            expected[np.unravel_index(flat, shape)] = False
+
+            # act
+            result = index.neighbours(flat, radius=radius, moore=moore, annular=annular)
+
+            # assert
+            assert sorted(result) == list(np.flatnonzero(expected))
+
+    @pytest.mark.parametrize("moore", [True, False])
+    @pytest.mark.parametrize("radius", [1, 2])
+    def test_within_radius(self, radius, moore):
+        """测试整体计算的“周围有”图层与逐个查找邻居的结果一致"""
+        # arrange
+        shape = (5, 6)
+        presence = np.random.default_rng(0).random(shape) < 0.2
+        index = NeighbourhoodIndex(shape)
+
+        # act
+        result = within_radius(presence, radius=radius, moore=moore)
+
+        # assert
+        for flat in range(presence.size):
+            cells = index.neighbours(flat, radius=radius, moore=moore, annular=False)
+            assert result.flat[flat] == presence.flat[cells].any()
+
+    def test_ring_order(self):
+        """测试一圈邻居按行优先顺序排列，并且只计算一次"""
+        index = NeighbourhoodIndex((3, 3))
+        assert list(index.neighbours(4, radius=1)) == [1, 3, 5, 7]
+        assert index.ring(1) is index.ring(1)
+
+    def test_gather(self):
+        """测试一组格子的邻居按输入顺序拼接在一起"""
+        index = NeighbourhoodIndex((5, 6))
+        cells = np.array([7, 0, 29, 7])
+
+        owner, neighbours = index.gather(cells, radius=2)
+
+        for i, cell in enumerate(cells):
+            expected = index.neighbours(cell, radius=2)
+            np.testing.assert_array_equal(neighbours[owner == i], expected)
+
+    def test_pick_in_groups(self):
+        """测试每组按权重选出一个，权重全为0时组内等概率选择"""
+        rng = np.random.default_rng(0)
+        owner = np.array([0, 0, 0, 2, 2, 3])
+        weights = np.array([0.0, 1.0, np.nan, 0.0, 0.0, -1.0])
+
+        picks = [pick_in_groups(owner, weights, rng) for _ in range(200)]
+
+        for groups, chosen in picks:
+            np.testing.assert_array_equal(groups, [0, 2, 3])
+            assert chosen[0] == 1 and chosen[2] == 5
+        assert {chosen[1] for _, chosen in picks} == {3, 4}
+
+
+class TestToyLandscape:
+    """测试整体生成的玩具地形"""
+
+    @pytest.mark.parametrize("smoothness", [0, 3])
+    def test_ratios(self, smoothness):
+        """测试各类地块的比例，且地形与适宜性的判断一致"""
+        # act
+        layers = toy_landscape(
+            (100, 100),
+            arable_ratio=0.4,
+            water_ratio=0.2,
+            rice_arable_ratio=0.05,
+            lim_h=31.93,
+            smoothness=smoothness,
+            rng=np.random.default_rng(0),
+        )
+        suitability = suitability_layers(
+            elevation=layers["elevation"],
+            slope=layers["slope"],
+            is_water=layers["is_water"],
+        )
+
+        # assert
+        is_water = layers["is_water"]
+        assert is_water.mean() == pytest.approx(0.2, abs=0.02)
+        assert suitability["is_arable"].mean() == pytest.approx(0.32, abs=0.03)
+        assert suitability["is_rice_arable"].sum() <= suitability["is_arable"].sum()
+        assert not (suitability["is_arable"] & is_water).any()
+        assert np.allclose(layers["lim_h"][~is_water], 31.93)
+        assert (layers["lim_h"][is_water] == 0).all()
+
+    def test_smoothed_noise(self):
+        """测试平滑噪声仍然均匀分布，但相邻格子的数值更接近"""
+        # arrange
+        shape = (60, 60)
+
+        # act
+        white = smoothed_noise(shape, np.random.default_rng(1))
+        smooth = smoothed_noise(shape, np.random.default_rng(1), smoothness=3)
+
+        # assert
+        assert 0 <= smooth.min() and smooth.max() < 1
+        assert (smooth < 0.3).mean() == pytest.approx(0.3, abs=0.001)
+
+        def correlation(field):
+            return np.corrcoef(field[:, :-1].ravel(), field[:, 1:].ravel())[0, 1]
+
+        assert abs(correlation(white)) < 0.1
+        assert correlation(smooth) > 0.5
@@ -0,0 +1,135 @@
+#!/usr/bin/env python 3.11.0
+# -*-coding:utf-8 -*-
+# @Author  : Shuang (Twist) Song
+# @Contact   : SongshGeo@gmail.com
+# GitHub   : https://github.com/SongshGeo
+# Website: https://cv.songshgeo.com/
+
+"""测试模型的报告"""
+
+import gc
+import weakref
+
+import pytest
+
+from src.api import CompetingCell, CompetingModule, Farmer, Hunter
+from src.core import Model
+from src.core.model import REPORTER_CACHE_SIZE, compile_reporter
+from tests.conftest import cfg
+
+
+@pytest.mark.parametrize(
+    "expression, expected",
+    [
+        ("farmers group num", 2),
+        ("farmers size num", 80),
+        ("hunters group ratio", 1 / 3),
+        ("hunters size ratio", 0.2),
+        ("rice size num", 0.0),
+    ],
+)
+def test_compiled_reporters(model, expression, expected):
+    """测试解析后的报告与按属性名读取的结果一致"""
+    # arrange
+    model.agents.new(Farmer, singleton=True, size=50)
+    model.agents.new(Farmer, singleton=True, size=30)
+    model.agents.new(Hunter, singleton=True, size=20)
+
+    # act
+    reporter = compile_reporter(expression)
+
+    # assert
+    assert reporter(model) == pytest.approx(expected)
+    assert getattr(model, expression) == pytest.approx(expected)
+
+
+def test_unknown_attribute(model):
+    """测试不是报告的名称按普通的属性处理"""
+    assert compile_reporter("farmers") is None
+    assert compile_reporter("bkp_farmers_n") is None
+    assert not hasattr(model, "unknown")
+    with pytest.raises(AttributeError):
+        getattr(model, "farmers size")
+
+
+def test_unknown_attribute_cached(model):
+    """测试不是报告的名称只解析一次"""
+    # arrange
+    hasattr(model, "not a reporter")
+    hits = compile_reporter.cache_info().hits
+
+    # act
+    for _ in range(3):
+        assert not hasattr(model, "not a reporter")
+
+    # assert
+    assert compile_reporter.cache_info().hits == hits + 3
+    assert compile_reporter.cache_info().maxsize == REPORTER_CACHE_SIZE
+
+
+def test_compile_reporters(model):
+    """测试开始运行前，数据收集器里的报告被替换成解析后的函数"""
+    # arrange
+    model.settings.reports = {"model": {"num_farmers_n": "farmers size num"}}
+    model.datacollector.add_reporters("model", {"num_farmers_n": "farmers size num"})
+    model.agents.new(Farmer, singleton=True, size=50)
+
+    # act
+    model.setup()
+    model.datacollector.collect(model)
+
+    # assert
+    reporter = model.datacollector.model_reporters["num_farmers_n"]
+    assert reporter is compile_reporter("farmers size num")
+    assert model.datacollector.get_model_vars_dataframe()["num_farmers_n"].tolist() == [
+        50
+    ]
+
+
+def test_stop(model):
+    """测试人口构成稳定后提前结束，记录结束的时间和原因"""
+    # arrange
+    model.settings.model.steady = {"enabled": True, "window": 2, "min_ticks": 2}
+    assert model.stop_reason is None
+
+    # act
+    for _ in range(3):
+        if model.running:
+            model.time.go()
+            model.step()
+
+    # assert
+    assert not model.running and model.stop_reason == "steady"
+    assert model.stop_tick == 2 and model.time.tick == 2
+
+
+def test_analysis_cache():
+    """测试分析结果保存在模型里，收集新的数据后重新计算，运行结束后模型可以释放"""
+    # arrange
+    model = Model(parameters=cfg)
+    layer = model.nature.create_module(
+        name="layer",
+        shape=(4, 4),
+        cell_cls=CompetingCell,
+        module_cls=CompetingModule,
+    )
+    model.datacollector.add_reporters("model", {"num_farmers_n": "farmers size num"})
+    farmer = model.agents.new(Farmer, singleton=True, size=10)
+    farmer.move.to(layer.array_cells[1, 1])
+    for size in (10, 10, 10, 10, 10, 50, 60, 70, 80, 90):
+        farmer.size = size
+        model.datacollector.collect(model)
+
+    # act
+    bkp = model.detect_breakpoints("farmers")
+
+    # assert
+    assert bkp == 5 and model.detect_breakpoints("farmers") is bkp
+    assert model.calc_rate("farmers")[1] == pytest.approx(10.0)
+    model.datacollector.collect(model)
+    assert len(model.get_data_col("farmers")) == 11
+    ref = weakref.ref(model)
+    model.release()
+    del model, farmer, layer
+    gc.collect()
+    assert ref() is None
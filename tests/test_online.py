@@ -0,0 +1,109 @@
+#!/usr/bin/env python 3.11.0
+# -*-coding:utf-8 -*-
+# @Author  : Shuang (Twist) Song
+# @Contact   : SongshGeo@gmail.com
+# GitHub   : https://github.com/SongshGeo
+# Website: https://cv.songshgeo.com/
+
+"""测试运行中逐步更新的断点检测"""
+
+import numpy as np
+import pytest
+
+from src.api import Farmer
+from src.core.model import compile_reporter
+from src.workflow.online import Cusum, OnlineBreakpoints, SteadyState
+
+
+def test_cusum():
+    """测试增长量变化时检测到断点，之后没有新的变化时认为稳定"""
+    # arrange
+    rng = np.random.default_rng(0)
+    values = np.r_[np.arange(30) * 2.0, 58 + np.arange(1, 31) * 10.0]
+    values += rng.normal(scale=0.5, size=len(values))
+    cusum = Cusum(warmup=10, patience=10)
+
+    # act
+    alarms = [index for index, value in enumerate(values) if cusum.update(value)]
+
+    # assert
+    assert alarms == [30] and 26 <= cusum.bkp <= 29
+    assert cusum.alarms == len(alarms) and cusum.stable
+
+
+def test_cusum_flat():
+    """测试一直没有变化时不会检测到断点"""
+    cusum = Cusum(warmup=3)
+    for _ in range(20):
+        assert not cusum.update(0)
+    assert cusum.bkp is None and cusum.statistic == 0 and not cusum.stable
+
+
+def test_should_stop():
+    """测试关注的主体都稳定之后才停止"""
+    # arrange
+    values = {"farmers": 0.0, "rice": 0.0}
+    readers = {breed: lambda breed=breed: values[breed] for breed in values}
+    online = OnlineBreakpoints(readers, stop_on=["farmers"], warmup=2, patience=3)
+
+    # act / assert
+    for tick in range(10):
+        values["farmers"] = 0.0 if tick < 5 else (tick - 4) * 10.0
+        online.update()
+    assert online["farmers"].bkp == 4 and online["rice"].bkp is None
+    assert online.should_stop
+    with pytest.raises(ValueError):
+        OnlineBreakpoints(readers, stop_on=["hunters"])
+
+
+def test_online_reporters(model):
+    """测试模型按 `detect_bkp_by` 读取统计结果，通过报告读取检测的状态"""
+    # arrange
+    assert model.online is None and compile_reporter("online_bkp_rice")(model) is None
+    del model.online
+    model.settings.model.online = {"enabled": True, "warmup": 2, "stop_on": ["farmers"]}
+    farmer = model.agents.new(Farmer, singleton=True, size=50)
+
+    # act
+    for size in (50, 50, 50, 50, 200):
+        farmer.size = size
+        model.online.update()
+
+    # assert
+    assert compile_reporter("online_bkp_farmers")(model) == 3
+    assert compile_reporter("online_stat_rice")(model) == 0
+    assert not model.online.should_stop
+
+
+def test_steady_state():
+    """测试窗口内人口比例的相对变化都很小时认为已经稳定"""
+    # arrange
+    values = {"farmers": 0.5, "rice": 0.0}
+    readers = {breed: lambda breed=breed: values[breed] for breed in values}
+    steady = SteadyState(readers, window=3, tolerance=0.1, min_ticks=0)
+
+    # act
+    reasons = []
+    for share in (0.2, 0.4, 0.5, 0.52, 0.5):
+        values["farmers"] = share
+        reasons.append(steady.update())
+
+    # assert
+    assert reasons == [None, None, None, None, "steady"]
+
+
+def test_extinct():
+    """测试曾经存在的主体灭绝时结束，但不早于最少的步数"""
+    # arrange
+    values = {"hunters": 1.0, "rice": 0.0}
+    readers = {breed: lambda breed=breed: values[breed] for breed in values}
+    steady = SteadyState(readers, window=10, extinct=True, min_ticks=3)
+
+    # act
+    reasons = []
+    for share in (1.0, 0.0, 0.0, 0.0):
+        values["hunters"] = share
+        reasons.append(steady.update())
+
+    # assert
+    assert reasons == [None, None, "extinct", "extinct"]
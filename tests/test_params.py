@@ -0,0 +1,59 @@
+#!/usr/bin/env python 3.11.0
+# -*-coding:utf-8 -*-
+# @Author  : Shuang (Twist) Song
+# @Contact   : SongshGeo@gmail.com
+# GitHub   : https://github.com/SongshGeo
+# Website: https://cv.songshgeo.com/
+
+"""测试冻结的参数快照"""
+
+import pickle
+
+import pytest
+
+from src.api import Farmer, Hunter, RiceFarmer
+from src.api.params import FrozenParams, ParamsCache
+
+
+def test_frozen_params(model):
+    """测试快照与配置一致，并且只读"""
+    # arrange
+    frozen = ParamsCache.of(model)["Farmer"]
+
+    # assert
+    assert isinstance(frozen.loss, FrozenParams)
+    assert frozen.loss.prob == model.settings.Farmer.loss.prob
+    assert frozen.new_group_size == (30, 60)
+    assert frozen.get("missing", 5) == 5
+    assert ParamsCache.of(model)["Farmer"] is frozen
+    with pytest.raises(AttributeError):
+        frozen.area = 3
+    assert pickle.loads(pickle.dumps(frozen)) == frozen
+
+
+def test_thaw_on_params(model):
+    """测试通过主体的 `params` 修改参数后，快照重新生成"""
+    # arrange
+    farmer = model.agents.new(Farmer, singleton=True)
+    frozen = farmer.frozen
+
+    # act
+    farmer.params.loss.prob = 0.5
+
+    # assert
+    assert farmer.frozen is not frozen
+    assert farmer.frozen.loss.prob == 0.5
+    assert model.agents.new(Farmer, singleton=True).frozen.loss.prob == 0.5
+
+
+def test_convert_switch(model, layer):
+    """测试顶层的 `convert` 开关能够关闭转化"""
+    # arrange
+    cell = layer.array_cells[0, 0]
+    hunter = cell.agents.new(Hunter, size=50)
+    model.settings.convert.hunter_to_farmer = False
+    ParamsCache.of(model).thaw()
+
+    # act / assert
+    assert cell.convert(hunter, "Farmer") is hunter
+    assert isinstance(cell.convert(hunter, "RiceFarmer"), RiceFarmer)
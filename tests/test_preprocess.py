@@ -0,0 +1,170 @@
+#!/usr/bin/env python 3.11.0
+# -*-coding:utf-8 -*-
+# @Author  : Shuang (Twist) Song
+# @Contact   : SongshGeo@gmail.com
+# GitHub   : https://github.com/SongshGeo
+# Website: https://cv.songshgeo.com/
+
+"""测试地形栅格的预处理和缓存"""
+
+import os
+
+import numpy as np
+import pytest
+import rasterio
+from abses import MainModel
+from omegaconf import OmegaConf
+from rasterio.transform import from_origin
+
+from src.api.env import CompetingCell, CompetingModule, Env
+from src.api.preprocess import landscape_bundle, read_landscape
+from src.core import Model, MyExperiment
+
+from .conftest import cfg
+
+
+def write_tif(path, arr: np.ndarray, nodata=None) -> str:
+    """写一个用于测试的单波段 GeoTIFF"""
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        height=arr.shape[0],
+        width=arr.shape[1],
+        count=1,
+        dtype=arr.dtype,
+        crs="EPSG:4326",
+        transform=from_origin(100, 25, 0.1, 0.1),
+        nodata=nodata,
+    ) as dataset:
+        dataset.write(arr, 1)
+    return str(path)
+
+
+@pytest.fixture(name="sources")
+def mock_sources(tmp_path):
+    """高程、坡度和人口上限三个栅格"""
+    dem = np.array([[-9999, 50, 150], [0, 10, 300]], dtype="float32")
+    slope = np.array([[1, 0.2, 5], [-1, 12, 3]], dtype="float32")
+    lim_h = np.full((2, 3), 31.93, dtype="float32")
+    return {
+        "dem": write_tif(tmp_path / "dem.tif", dem, nodata=-9999),
+        "slope": write_tif(tmp_path / "slope.tif", slope),
+        "lim_h": write_tif(tmp_path / "lim_h.tif", lim_h),
+    }
+
+
+class TestLandscapeBundle:
+    """测试缓存包"""
+
+    def test_read(self, sources):
+        """测试解码得到的图层和空间信息"""
+        layers, meta = read_landscape(**sources)
+
+        assert (meta["height"], meta["width"]) == (2, 3)
+        assert np.isnan(layers["elevation"][0, 0])
+        assert np.isnan(layers["slope"][1, 0])
+        np.testing.assert_array_equal(
+            layers["mask"], [[False, True, True], [True, True, True]]
+        )
+        np.testing.assert_array_equal(
+            layers["is_arable"], [[False, True, True], [False, False, False]]
+        )
+        assert layers["is_rice_arable"][0, 1]
+
+    def test_cache(self, sources, tmp_path):
+        """测试缓存的内容与直接解码一致，源文件改变后重新生成"""
+        # arrange
+        cache = tmp_path / "cache"
+        expected, meta = read_landscape(**sources)
+
+        # act
+        layers, cached_meta = landscape_bundle(**sources, cache=cache)
+
+        # assert
+        assert cached_meta == meta
+        assert isinstance(layers["elevation"], np.memmap)
+        for name, arr in expected.items():
+            np.testing.assert_array_equal(layers[name], arr)
+        assert len(os.listdir(cache)) == 1
+        landscape_bundle(**sources, cache=cache)
+        assert len(os.listdir(cache)) == 1
+        os.utime(sources["slope"], ns=(0, 0))
+        landscape_bundle(**sources, cache=cache)
+        assert len(os.listdir(cache)) == 2
+
+    def test_load_terrain(self, sources, tmp_path):
+        """测试图层从缓存包载入斑块"""
+        # arrange
+        model = MainModel(parameters=cfg)
+        layers, meta = landscape_bundle(**sources, cache=tmp_path / "cache")
+        module = model.nature.create_module(
+            module_cls=CompetingModule, cell_cls=CompetingCell, **meta
+        )
+
+        # act
+        module.load_terrain(layers)
+
+        # assert
+        cell = module.array_cells[0, 1]
+        assert cell.elevation == 50 and cell.lim_h == pytest.approx(31.93)
+        assert cell.is_rice_arable
+        assert not module.mask[0, 0]
+        assert module.array_cells[0, 0].is_water
+
+    def test_load_terrain_shares_memory(self, tmp_path):
+        """测试源数据不是 float32 时，缓存包的图层也可以直接共享，不会复制"""
+        # arrange
+        dem = np.array([[-9999, 50, 150], [0, 10, 300]], dtype="int16")
+        slope = np.array([[1, 0.2, 5], [-1, 10.000000001, 3]], dtype="float64")
+        sources = {
+            "dem": write_tif(tmp_path / "dem.tif", dem, nodata=-9999),
+            "slope": write_tif(tmp_path / "slope.tif", slope),
+            "lim_h": write_tif(tmp_path / "lim_h.tif", slope),
+        }
+        model = MainModel(parameters=cfg)
+        layers, meta = landscape_bundle(**sources, cache=tmp_path / "cache")
+        module = model.nature.create_module(
+            module_cls=CompetingModule, cell_cls=CompetingCell, **meta
+        )
+
+        # act
+        module.load_terrain(layers)
+
+        # assert
+        for attr in ("elevation", "slope", "lim_h"):
+            assert layers[attr].dtype == np.float32
+            assert np.shares_memory(module.terrain[attr], layers[attr])
+        cached = {name: arr.copy() for name, arr in module.suitability.items()}
+        module.invalidate_suitability()
+        for name, arr in cached.items():
+            np.testing.assert_array_equal(module.suitability[name], arr)
+
+
+def test_share_landscape(sources, tmp_path):
+    """测试实验在运行之前准备好共享的缓存包，而不修改实验的配置"""
+    # arrange
+    config = OmegaConf.merge(cfg, {"ds": {**sources, "cache": str(tmp_path / "c")}})
+    exp = MyExperiment(Model, cfg=config, nature_class=Env)
+    before = OmegaConf.to_container(exp.cfg)
+
+    # act
+    shared = exp.share_landscape()
+
+    # assert
+    assert shared.ds.cache == str(tmp_path / "c")
+    assert len(os.listdir(tmp_path / "c")) == 1
+    assert OmegaConf.to_container(exp.cfg) == before
+    assert MyExperiment(Model, cfg=config).share_landscape() is None
+
+
+def test_share_landscape_without_cache(sources):
+    """测试没有配置缓存目录时，不准备缓存包，实验的配置也不变"""
+    # arrange
+    config = OmegaConf.merge(cfg, {"ds": {**sources, "cache": None}})
+    exp = MyExperiment(Model, cfg=config, nature_class=Env)
+
+    # act / assert
+    assert exp.share_landscape() is None
+    assert exp.cfg.ds.cache is None
+    assert exp.cfg.ds.dem == sources["dem"]
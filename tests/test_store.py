@@ -0,0 +1,104 @@
+#!/usr/bin/env python 3.11.0
+# -*-coding:utf-8 -*-
+# @Author  : Shuang (Twist) Song
+# @Contact   : SongshGeo@gmail.com
+# GitHub   : https://github.com/SongshGeo
+# Website: https://cv.songshgeo.com/
+
+"""测试按主体类型保存属性的数组"""
+
+from src.api import Farmer, Hunter
+from src.api.store import AgentStore
+
+
+def test_store_slots(model, layer):
+    """测试主体的属性保存在所属类型的数组里，位置随移动更新"""
+    # arrange
+    store = AgentStore.of(model)[Farmer]
+
+    # act
+    farmer = model.agents.new(Farmer, singleton=True, size=50)
+    farmer.move.to(layer.array_cells[1, 2])
+
+    # assert
+    slot = farmer._slot
+    assert store.size[slot] == 50 and store.area[slot] == farmer.area
+    assert store.cell[slot] == 1 * 4 + 2
+    farmer.growth_rate = 0.5
+    assert store.growth_rate[slot] == 0.5
+    farmer.move.off()
+    assert store.cell[slot] == -1
+    assert AgentStore.of(model)[Hunter] is not store
+
+
+def test_store_release(model):
+    """测试死亡的主体保留最后的属性值，槽位到下一步才重新使用"""
+    # arrange
+    store = AgentStore.of(model)[Farmer]
+    farmer = model.agents.new(Farmer, singleton=True, size=50)
+    slot = farmer._slot
+
+    # act
+    farmer.die()
+    other = model.agents.new(Farmer, singleton=True, size=20)
+
+    # assert
+    assert farmer.size == 50 and not store.alive[slot]
+    assert other._slot != slot
+    store.recycle()
+    assert model.agents.new(Farmer, singleton=True)._slot == slot
+    assert farmer.size == 50
+    assert len(store) == 2
+
+
+def test_reuse_shells(model, layer):
+    """测试转化时重新使用死亡主体留下的对象，与新创建的主体一致"""
+    # arrange
+    store = AgentStore.of(model)[Hunter]
+    store.reuse = True
+    cell = layer.array_cells[2, 1]
+    old = model.agents.new(Hunter, singleton=True, size=50)
+    old_id = old.unique_id
+    old.die()
+    assert not store.shells
+    store.recycle()
+    farmer = cell.agents.new(Farmer, size=40)
+
+    # act
+    hunter = cell.convert(farmer, "Hunter")
+
+    # assert
+    assert hunter is old and hunter.alive and not farmer.alive
+    assert hunter.unique_id > old_id and hunter in model.agents[Hunter]
+    assert hunter.source == "Farmer" and hunter.size == 40
+    assert hunter.at is cell and list(cell.agents) == [hunter]
+    assert layer.occupancy[2, 1] == hunter.unique_id
+    assert layer.population["hunters"][2, 1] == 40
+    assert store.alive[hunter._slot] and store.cell[hunter._slot] == 2 * 4 + 1
+    assert not store.shells
+
+
+def test_census(model, layer):
+    """测试主体数量和总人口随出生、人口变化、转化和死亡而更新，与遍历的结果一致"""
+    # arrange
+    cell = layer.array_cells[0, 0]
+    farmer = cell.agents.new(Farmer, size=30.5)
+    hunters = [model.agents.new(Hunter, singleton=True, size=20) for _ in range(3)]
+
+    # act
+    hunters[0].size = 40.2
+    hunters[1].die()
+    cell.convert(farmer, "Hunter")
+    store = AgentStore.of(model)
+    store[Hunter].set_size(store[Hunter].slots(), [10, 11, 12])
+
+    # assert
+    for breed in (Farmer, Hunter):
+        agents = model.agents[breed]
+        assert store[breed].count == len(agents)
+        assert store[breed].total == sum(agent.size for agent in agents)
+    assert store.count == len(model.agents) == 3
+    assert store.total == 33
+    assert getattr(model, "hunters size ratio") == 1.0
+    assert getattr(model, "hunters group num") == 3
+    assert getattr(model, "farmers size num") == 0.0